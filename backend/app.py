@@ -5,7 +5,10 @@ from dotenv import load_dotenv
 import os
 
 from models import db
+from llm_cache import llm_cache
 from routes import api_blueprint
+from query_stats import init_query_stats
+from profiling import init_profiling
 
 load_dotenv()
 
@@ -17,12 +20,77 @@ def create_app():
 
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///app.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['LLM_MAX_CONCURRENCY'] = int(os.getenv('LLM_MAX_CONCURRENCY', '5'))
+    app.config['LLM_CALL_TIMEOUT'] = float(os.getenv('LLM_CALL_TIMEOUT', '30'))
+    # total time an LLM call may take, retries and hedges included, by
+    # endpoint: "api.submit_sentence=20,..."; LLM_DEADLINE for the rest
+    app.config['LLM_DEADLINE'] = float(os.getenv('LLM_DEADLINE', '60'))
+    app.config['LLM_ROUTE_DEADLINES'] = {
+        route.strip(): float(seconds)
+        for route, seconds in (
+            item.split('=', 1)
+            for item in os.getenv(
+                'LLM_ROUTE_DEADLINES',
+                'api.submit_sentence=20,api.vocab_submit=20,api.personalized_error_submit=20',
+            ).split(',')
+            if '=' in item
+        )
+    }
+    app.config['LLM_MAX_RETRIES'] = int(os.getenv('LLM_MAX_RETRIES', '2'))
+    app.config['LLM_RETRY_BACKOFF'] = float(os.getenv('LLM_RETRY_BACKOFF', '0.5'))
+    # send a duplicate request once a call is slower than this percentile of
+    # recent calls for its route; 0 turns hedging off
+    app.config['LLM_HEDGE_PERCENTILE'] = float(os.getenv('LLM_HEDGE_PERCENTILE', '0'))
+    app.config['LLM_HEDGE_MIN_SAMPLES'] = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', '20'))
+    # fraction of LLM calls whose full prompt and response are logged
+    app.config['LLM_LOG_SAMPLE_RATE'] = float(os.getenv('LLM_LOG_SAMPLE_RATE', '0'))
+    # sequential | parallel | combined, see grading.grade
+    app.config['GRADING_MODE'] = os.getenv('GRADING_MODE', 'parallel')
+    # local rules that may settle the judge verdict in sequential mode,
+    # see judge_rules.RULES; empty to always ask the LLM judge
+    app.config['JUDGE_RULES'] = [
+        r.strip()
+        for r in os.getenv(
+            'JUDGE_RULES', 'empty_translation,no_corrections,matches_correction'
+        ).split(',')
+        if r.strip()
+    ]
+    # reference translations requested per generated sentence (0 = none),
+    # and how close a submission must be to one to skip the LLM, as
+    # 1 - token edit distance / length; see references.py
+    app.config['REFERENCE_TRANSLATIONS'] = int(os.getenv('REFERENCE_TRANSLATIONS', '2'))
+    app.config['LOCAL_GRADING_MIN_SIMILARITY'] = float(
+        os.getenv('LOCAL_GRADING_MIN_SIMILARITY', '1.0')
+    )
+    app.config['GRADING_BATCH_SIZE'] = int(os.getenv('GRADING_BATCH_SIZE', '10'))
+    app.config['QUERY_STATS_ENABLED'] = os.getenv('QUERY_STATS_ENABLED', '0') == '1'
+    app.config['QUERY_STATS_N1_THRESHOLD'] = int(os.getenv('QUERY_STATS_N1_THRESHOLD', '3'))
+    app.config['PROFILING_ENABLED'] = os.getenv('PROFILING_ENABLED', '0') == '1'
+    app.config['PROFILING_SAMPLE_RATE'] = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+    app.config['PROFILING_DUMP_DIR'] = os.getenv('PROFILING_DUMP_DIR')
+    app.config['SENTENCE_POOL_LOW_WATERMARK'] = int(os.getenv('SENTENCE_POOL_LOW_WATERMARK', '3'))
+    app.config['SENTENCE_POOL_HIGH_WATERMARK'] = int(os.getenv('SENTENCE_POOL_HIGH_WATERMARK', '10'))
+    app.config['SENTENCE_POOL_IDLE_SECONDS'] = int(os.getenv('SENTENCE_POOL_IDLE_SECONDS', '600'))
+    app.config['REFDATA_CACHE_TTL'] = int(os.getenv('REFDATA_CACHE_TTL', '300'))
+    app.config['LLM_CACHE_PATH'] = os.getenv('LLM_CACHE_PATH')
+    app.config['LLM_CACHE_TTL'] = int(os.getenv('LLM_CACHE_TTL', '86400'))
+    app.config['LLM_CACHE_MAX_ENTRIES'] = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '10000'))
+    # call sites allowed to use the cache: correction, judge, grading,
+    # instruction
+    app.config['LLM_CACHE_ENDPOINTS'] = [
+        e.strip()
+        for e in os.getenv('LLM_CACHE_ENDPOINTS', 'correction,judge,grading').split(',')
+        if e.strip()
+    ]
 
     db.init_app(app)
+    llm_cache.init_app(app)
 
     with app.app_context():
         db.create_all()
 
+    init_query_stats(app, api_blueprint)
+    init_profiling(app, api_blueprint)
     app.register_blueprint(api_blueprint)
 
     return app
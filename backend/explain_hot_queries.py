@@ -0,0 +1,131 @@
+"""Print EXPLAIN plans for the hot query paths, without and with their indexes.
+
+Usage:
+    python explain_hot_queries.py [--user-id 1] [--language French]
+
+The "before" plans are taken inside a transaction (Postgres) or on an
+in-memory copy of the database (SQLite) from which the hot path indexes
+have been dropped, so the real database is never modified.
+"""
+import argparse
+import sqlite3
+from sqlalchemy import select
+
+from app import create_app
+from models import db, Error, Module, ModuleResult, Sentence, VocabWord
+
+
+HOT_PATH_INDEXES = [
+    "ix_sentence_user_id_timestamp",
+    "ix_error_module_id",
+    "ix_error_sentence_id",
+    "ix_vocab_word_user_id_language_last_correct",
+    "ix_vocab_word_user_id_language_next_due",
+    "ix_error_user_id_next_due",
+    "ix_module_result_user_id_timestamp",
+    "uq_module_name_language",
+]
+
+
+def hot_queries(user_id, language, module_name, module_id):
+    return {
+        "sentences by user (export_session)": select(Sentence).where(
+            Sentence.user_id == user_id
+        ),
+        "errors by module": select(Error).where(Error.module_id == module_id),
+        "errors due (personalized_errors)": select(Error)
+        .join(Module, Error.module_id == Module.id)
+        .where(Error.user_id == user_id, Module.language == language)
+        .order_by(Error.next_due, Error.id)
+        .limit(20),
+        "vocab due (vocab_preload)": select(VocabWord)
+        .where(VocabWord.user_id == user_id, VocabWord.language == language)
+        .order_by(VocabWord.next_due, VocabWord.id)
+        .limit(5),
+        "module results (module_results)": select(ModuleResult)
+        .where(ModuleResult.user_id == user_id)
+        .order_by(ModuleResult.timestamp.desc()),
+        "module lookup by name": select(Module).where(
+            Module.name == module_name, Module.language == language
+        ),
+    }
+
+
+def compile_sql(stmt, dialect):
+    return str(stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+
+
+def explain_sqlite(conn, sql):
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    return [row[-1] for row in rows]
+
+
+def explain_postgres(conn, sql):
+    return [row[0] for row in conn.exec_driver_sql(f"EXPLAIN {sql}")]
+
+
+def plans_sqlite(engine, queries):
+    path = engine.url.database
+    source = sqlite3.connect(path)
+    before_db = sqlite3.connect(":memory:")
+    source.backup(before_db)
+    for name in HOT_PATH_INDEXES:
+        before_db.execute(f"DROP INDEX IF EXISTS {name}")
+    before = {k: explain_sqlite(before_db, sql) for k, sql in queries.items()}
+    after = {k: explain_sqlite(source, sql) for k, sql in queries.items()}
+    return before, after
+
+
+def plans_postgres(engine, queries):
+    with engine.connect() as conn:
+        after = {k: explain_postgres(conn, sql) for k, sql in queries.items()}
+        conn.rollback()
+        # DDL is transactional in Postgres, so the drops vanish on rollback
+        for name in HOT_PATH_INDEXES:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+        before = {k: explain_postgres(conn, sql) for k, sql in queries.items()}
+        conn.rollback()
+    return before, after
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--language", default="French")
+    parser.add_argument("--module", default="")
+    parser.add_argument("--module-id", type=int, default=1)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        engine = db.engine
+        module_name = args.module or db.session.scalar(
+            select(Module.name).order_by(Module.id).limit(1)
+        ) or ""
+        queries = {
+            name: compile_sql(stmt, engine.dialect)
+            for name, stmt in hot_queries(
+                args.user_id, args.language, module_name, args.module_id
+            ).items()
+        }
+        if engine.dialect.name == "sqlite":
+            before, after = plans_sqlite(engine, queries)
+        elif engine.dialect.name == "postgresql":
+            before, after = plans_postgres(engine, queries)
+        else:
+            parser.error(f"unsupported database: {engine.dialect.name}")
+
+    for name, sql in queries.items():
+        print(f"== {name}")
+        print(sql)
+        print("-- before")
+        for line in before[name]:
+            print(f"   {line}")
+        print("-- after")
+        for line in after[name]:
+            print(f"   {line}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""A stand-in for the OpenAI client, for load tests and local development
+without network access or API spend.
+
+``FakeOpenAI`` answers ``chat.completions.create`` like the real client
+(including ``stream=True``), after a configurable delay, with text picked
+by matching the prompt against response templates.
+"""
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+
+SENTENCES = [
+    "I would like a coffee, please.",
+    "Where is the train station?",
+    "We went to the market yesterday.",
+    "Could you close the window?",
+    "If it rains, we will stay home.",
+    "She has lived here for ten years.",
+    "Don't forget to call your mother.",
+    "They are looking for a new apartment.",
+    "How long does the meeting last?",
+    "He reads the newspaper every morning.",
+]
+
+CORRECTION = (
+    "{translation}\n"
+    "{translation} *corrigé*\n"
+    "Explanation:\n"
+    "agreement → the adjective agrees with the noun\n"
+    "tense → use the passé composé for a completed action"
+)
+
+
+def _with_references(count):
+    sentences = [random.choice(SENTENCES) for _ in range(count)]
+    return json.dumps(
+        {"sentences": [{"english": s, "translations": [f"Traduction : {s}"]} for s in sentences]}
+    )
+
+
+def _numbered(count):
+    lines = [f"{i}. {random.choice(SENTENCES)}" for i in range(1, count + 1)]
+    return "Here are the sentences:\n" + "\n".join(lines) + "\nGood luck!"
+
+
+def _verdict(correct_rate):
+    return "1" if random.random() < correct_rate else "0"
+
+
+def _submission(prompt):
+    match = re.search(r"New submission \n(.*) - (.*)\.\s*$", prompt, re.S)
+    return match.group(2) if match else "Je voudrais un café"
+
+
+def _batch(prompt, correct_rate):
+    submissions = re.findall(r"^\s*(\d+)\. .* - (.*)\.$", prompt, re.M)
+    results = [
+        {
+            "index": int(index),
+            "correction": CORRECTION.format(translation=translation),
+            "correct": int(_verdict(correct_rate)),
+        }
+        for index, translation in submissions
+    ]
+    return json.dumps({"results": results})
+
+
+def default_responder(prompt, correct_rate=0.7):
+    """Reply shaped like what each call site in the app expects."""
+    if '"results"' in prompt:
+        return _batch(prompt, correct_rate)
+    if '"correction"' in prompt:
+        text = CORRECTION.format(translation=_submission(prompt))
+        return json.dumps({"correction": text, "correct": int(_verdict(correct_rate))})
+    if "Respond only with 1" in prompt:
+        return _verdict(correct_rate)
+    count = re.search(r"Generate (\d+) short English sentences", prompt)
+    if count and '"sentences"' in prompt:
+        return _with_references(int(count.group(1)))
+    if count:
+        return _numbered(int(count.group(1)))
+    if "Correct these" in prompt:
+        return CORRECTION.format(translation=_submission(prompt))
+    return "This module covers the topic with a short explanation and three examples."
+
+
+class _Completions:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def create(self, model=None, messages=None, timeout=None, stream=False, **kwargs):
+        owner = self._owner
+        prompt = messages[-1]["content"]
+        text = owner.respond(prompt)
+        usage = SimpleNamespace(
+            prompt_tokens=len(prompt) // 4,
+            completion_tokens=len(text) // 4,
+            total_tokens=(len(prompt) + len(text)) // 4,
+        )
+        owner.count_call()
+        if stream:
+            return self._stream(text, usage, owner.delay())
+        time.sleep(owner.delay())
+        message = SimpleNamespace(content=text)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=message)], usage=usage, model=model
+        )
+
+    @staticmethod
+    def _stream(text, usage, delay):
+        words = re.findall(r"\S+\s*", text) or [text]
+        # first token after a third of the delay, the rest spread evenly
+        time.sleep(delay / 3)
+        step = (delay * 2 / 3) / len(words)
+        for word in words:
+            time.sleep(step)
+            delta = SimpleNamespace(content=word)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+        yield SimpleNamespace(choices=[], usage=usage)
+
+
+class FakeOpenAI:
+    """``latency`` and ``jitter`` are in seconds; each call sleeps for
+    ``latency`` +/- up to ``jitter``. ``templates`` is a list of
+    ``{"pattern": regex, "response": text}`` tried in order before the
+    default replies."""
+
+    def __init__(self, latency=0.8, jitter=0.3, templates=(), correct_rate=0.7):
+        self.latency = latency
+        self.jitter = jitter
+        self.correct_rate = correct_rate
+        self.templates = [(re.compile(t["pattern"]), t["response"]) for t in templates]
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+    def delay(self):
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def count_call(self):
+        with self._lock:
+            self.calls += 1
+
+    def respond(self, prompt):
+        for pattern, response in self.templates:
+            if pattern.search(prompt):
+                return response
+        return default_responder(prompt, self.correct_rate)
+
+
+def install(fake):
+    """Route every LLM call in the app through ``fake``."""
+    import llm
+
+    llm.client = fake
+    return fake
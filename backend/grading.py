@@ -0,0 +1,185 @@
+import json
+import time
+from flask import current_app
+
+import judge_rules
+from llm import complete, fan_out
+
+
+GRADING_MODES = ("sequential", "parallel", "combined")
+
+COMBINED_SUFFIX = """
+
+Grade the submission in a single reply. Respond with a JSON object with two keys:
+"correction": the full correction text exactly as described above,
+"correct": 1 or 0 answering this question: {judge_question}
+"""
+
+BATCH_SUFFIX = """
+
+Respond with a JSON object with one key, "results": a list of {count} objects,
+one per submission in the order given, each with the keys
+"index": the submission number,
+"correction": the correction text for that submission exactly as described above,
+"correct": 1 or 0 for that submission.
+"""
+
+
+def parse_verdict(text):
+    return 1 if text.strip().startswith("1") else 0
+
+
+def _timed(prompt, **kwargs):
+    start = time.perf_counter()
+    text = complete(prompt, **kwargs)
+    return text, (time.perf_counter() - start) * 1000
+
+
+def _grade_sequential(correction_prompt, judge_prompt, translation=None, required_word=None):
+    text, correction_ms = _timed(correction_prompt, cache="correction")
+    if translation is not None:
+        correct_val = judge_rules.decide(translation, text, required_word)
+        if correct_val is not None:
+            return text, correct_val, correction_ms
+    verdict, judge_ms = _timed(judge_prompt, cache="judge")
+    return text, parse_verdict(verdict), correction_ms + judge_ms
+
+
+def _grade_parallel(correction_prompt, judge_prompt, translation=None, required_word=None):
+    calls = [(correction_prompt, "correction"), (judge_prompt, "judge")]
+    results = fan_out(lambda call: _timed(call[0], cache=call[1]), calls)
+    if results[0] is None:
+        raise RuntimeError("correction call failed")
+    text, correction_ms = results[0]
+    if results[1] is None:
+        verdict, judge_ms = _timed(judge_prompt, cache="judge")
+    else:
+        verdict, judge_ms = results[1]
+    return text, parse_verdict(verdict), correction_ms + judge_ms
+
+
+def _grade_combined(correction_prompt, judge_prompt, translation=None, required_word=None):
+    prompt = correction_prompt + COMBINED_SUFFIX.format(judge_question=judge_prompt)
+    raw, elapsed_ms = _timed(
+        prompt, cache="grading", response_format={"type": "json_object"}
+    )
+    try:
+        payload = json.loads(raw)
+        text = str(payload["correction"]).strip()
+        correct_val = parse_verdict(str(payload["correct"]))
+    except (ValueError, KeyError, TypeError):
+        current_app.logger.warning("Combined grading reply was not valid JSON, falling back")
+        text, correct_val, fallback_ms = _grade_sequential(
+            correction_prompt, judge_prompt, translation, required_word
+        )
+        elapsed_ms += fallback_ms
+    return text, correct_val, elapsed_ms
+
+
+def grade(correction_prompt, judge_prompt, mode=None, translation=None, required_word=None):
+    """Run the correction and the 1/0 judge prompt for one submission.
+
+    ``mode`` (default ``GRADING_MODE`` from config) picks between two calls
+    back to back, two concurrent calls, or a single JSON call answering both.
+    When the learner's ``translation`` is given and ``JUDGE_RULES`` is not
+    empty, the calls always run back to back whatever the mode, so that
+    :mod:`judge_rules` can settle the verdict from the correction and skip
+    the judge call. That makes wrong answers as slow as sequential mode but
+    correct ones a single call. Pass ``translation`` only when the judge
+    asks nothing beyond the correction except, optionally, the use of
+    ``required_word``.
+    Returns ``(correction_text, correct_val)``.
+    """
+    mode = mode or current_app.config.get("GRADING_MODE", "parallel")
+    if mode not in GRADING_MODES:
+        raise ValueError(f"unknown grading mode: {mode}")
+    if translation is not None and current_app.config.get("JUDGE_RULES", judge_rules.RULES):
+        mode = "sequential"
+    graders = {
+        "sequential": _grade_sequential,
+        "parallel": _grade_parallel,
+        "combined": _grade_combined,
+    }
+    start = time.perf_counter()
+    text, correct_val, call_ms = graders[mode](
+        correction_prompt, judge_prompt, translation, required_word
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    current_app.logger.info(
+        "Grading mode=%s wall=%.0fms llm=%.0fms saved=%.0fms",
+        mode,
+        wall_ms,
+        call_ms,
+        max(call_ms - wall_ms, 0),
+    )
+    return text, correct_val
+
+
+def _parse_batch(raw, count):
+    """``(text, correct_val)`` per submission from a batch reply, ``None`` for
+    every submission the reply did not grade properly."""
+    graded = [None] * count
+    try:
+        results = json.loads(raw)["results"]
+    except (ValueError, KeyError, TypeError):
+        return graded
+    if not isinstance(results, list):
+        return graded
+    for position, item in enumerate(results):
+        try:
+            index = int(item.get("index", position + 1)) - 1
+            text = str(item["correction"]).strip()
+            correct_val = parse_verdict(str(item["correct"]))
+        except (AttributeError, KeyError, TypeError, ValueError):
+            continue
+        if 0 <= index < count and graded[index] is None:
+            graded[index] = (text, correct_val)
+    return graded
+
+
+def grade_batch(items, build_prompt, fallback, batch_size=None):
+    """Grade several submissions with one JSON call per ``batch_size`` items.
+
+    ``build_prompt(chunk)`` returns the prompt for a list of items; the
+    chunks are sent concurrently. Items a reply leaves out or mangles are
+    graded one by one with ``fallback(item)``, which returns
+    ``(correction_text, correct_val)`` like :func:`grade`.
+    Returns that pair for every item, in order.
+    """
+    batch_size = batch_size or current_app.config.get("GRADING_BATCH_SIZE", 10)
+    chunks = [items[i : i + batch_size] for i in range(0, len(items), batch_size)]
+
+    def grade_chunk(chunk):
+        prompt = build_prompt(chunk) + BATCH_SUFFIX.format(count=len(chunk))
+        return _timed(prompt, cache="grading", response_format={"type": "json_object"})
+
+    start = time.perf_counter()
+    results = []
+    call_ms = 0
+    for chunk, reply in zip(chunks, fan_out(grade_chunk, chunks)):
+        if reply is None:
+            results.extend([None] * len(chunk))
+            continue
+        raw, elapsed_ms = reply
+        call_ms += elapsed_ms
+        results.extend(_parse_batch(raw, len(chunk)))
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        current_app.logger.warning(
+            "Batch grading left %d of %d submissions ungraded, grading them one by one",
+            len(missing),
+            len(items),
+        )
+        for i, result in zip(missing, fan_out(fallback, [items[i] for i in missing])):
+            results[i] = result if result is not None else fallback(items[i])
+
+    current_app.logger.info(
+        "Batch grading items=%d calls=%d fallbacks=%d wall=%.0fms llm=%.0fms",
+        len(items),
+        len(chunks),
+        len(missing),
+        (time.perf_counter() - start) * 1000,
+        call_ms,
+    )
+    return results
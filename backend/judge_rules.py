@@ -0,0 +1,93 @@
+"""Local rules that settle the 1/0 judge verdict from the correction reply.
+
+Each rule takes the learner's translation, the correction text and the
+word the judge requires (or ``None``) and returns 1 or 0 when the answer is
+certain, or ``None`` to pass. A clean correction only settles a 1 if the
+judge asks nothing the correction does not check: vocab answers must also
+contain the target word, and callers whose judge has other conditions
+(/sentence/submit fails spelling mistakes the correction ignores) do not
+use the rules at all. Everything else still goes to the LLM judge.
+"""
+import string
+
+from flask import current_app
+
+from llm import current_route
+from metrics import JUDGE_DECISIONS
+
+
+NO_CORRECTIONS = "no corrections needed"
+
+_PUNCTUATION = str.maketrans({c: " " for c in string.punctuation + "«»¿¡…“”‘’"})
+
+
+def normalize(text):
+    """Casefold, drop bold markers and punctuation, collapse whitespace.
+    Accents are kept: a wrong accent is a real mistake for the judge."""
+    text = text.replace("*", "").replace("’", "'").casefold()
+    return " ".join(text.translate(_PUNCTUATION).split())
+
+
+def corrected_sentence(correction_text):
+    """The corrected sentence from a correction reply: the second line of the
+    ``<original>`` / ``<corrected>`` / explanation format, or ``None``."""
+    lines = [line.strip() for line in correction_text.splitlines() if line.strip()]
+    if len(lines) < 2 or lines[1].lower().startswith("explanation"):
+        return None
+    return lines[1]
+
+
+def contains_word(translation, word):
+    """``word`` appears as whole tokens in ``translation`` after normalizing."""
+    return f" {normalize(word)} " in f" {normalize(translation)} "
+
+
+def empty_translation(translation, correction_text, required_word=None):
+    if not normalize(translation):
+        return 0
+    return None
+
+
+def no_corrections(translation, correction_text, required_word=None):
+    if required_word and not contains_word(translation, required_word):
+        return None
+    if normalize(correction_text).startswith(NO_CORRECTIONS):
+        return 1
+    return None
+
+
+def matches_correction(translation, correction_text, required_word=None):
+    """The learner wrote exactly the corrected sentence (the model echoed it
+    back with nothing in bold)."""
+    if required_word and not contains_word(translation, required_word):
+        return None
+    corrected = corrected_sentence(correction_text)
+    if corrected is None or "*" in corrected:
+        return None
+    if normalize(corrected) == normalize(translation):
+        return 1
+    return None
+
+
+RULES = {
+    "empty_translation": empty_translation,
+    "no_corrections": no_corrections,
+    "matches_correction": matches_correction,
+}
+
+
+def decide(translation, correction_text, required_word=None):
+    """Run the rules enabled in ``JUDGE_RULES`` in order and return the first
+    verdict, or ``None`` when the LLM judge is needed. ``required_word`` is
+    a word the judge expects the translation to use. Either way the outcome
+    is counted in ``grading_judge_decisions_total``."""
+    enabled = current_app.config.get("JUDGE_RULES", RULES)
+    for name, rule in RULES.items():
+        if name not in enabled:
+            continue
+        verdict = rule(translation, correction_text, required_word)
+        if verdict is not None:
+            JUDGE_DECISIONS.inc(route=current_route(), rule=name)
+            return verdict
+    JUDGE_DECISIONS.inc(route=current_route(), rule="llm_judge")
+    return None
@@ -0,0 +1,378 @@
+import os
+import math
+import time
+import random
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dotenv import load_dotenv
+from flask import current_app, g, has_request_context, request
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    OpenAI,
+    RateLimitError,
+)
+
+from llm_cache import llm_cache
+from metrics import (
+    LLM_CACHE_HITS,
+    LLM_HEDGES,
+    LLM_LATENCY,
+    LLM_REQUESTS,
+    LLM_RETRIES,
+    LLM_TOKENS,
+)
+from profiling import add_llm_wait
+
+
+# worth another attempt; anything else (bad request, auth) is not
+RETRYABLE_ERRORS = (APIConnectionError, RateLimitError, InternalServerError)
+
+
+def _build_client():
+    """OpenAI client with its own retries off, since :func:`_with_retries`
+    retries within the route deadline, and a sized keep-alive pool so
+    concurrent calls reuse connections instead of paying a TLS handshake."""
+    kwargs = {}
+    try:
+        # httpx ships with the openai SDK
+        import httpx
+        from openai import DefaultHttpxClient
+    except ImportError:
+        pass
+    else:
+        kwargs["http_client"] = DefaultHttpxClient(
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "100")),
+                max_keepalive_connections=int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "20")),
+                keepalive_expiry=float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", "30")),
+            )
+        )
+    return OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        max_retries=0,
+        timeout=float(os.getenv("LLM_CALL_TIMEOUT", "30")),
+        **kwargs,
+    )
+
+
+load_dotenv()
+client = _build_client()
+
+
+def current_route():
+    """Endpoint the LLM call is made for, also from worker threads started by
+    :func:`fan_out` and :func:`run_in_background`."""
+    if has_request_context():
+        return request.endpoint or "unknown"
+    return g.get("llm_route", "background")
+
+
+def route_deadline(route=None):
+    """Seconds an LLM call for ``route`` may take in total, retries and
+    hedges included: ``LLM_ROUTE_DEADLINES`` or else ``LLM_DEADLINE``."""
+    config = current_app.config
+    route = route or current_route()
+    return config.get("LLM_ROUTE_DEADLINES", {}).get(route, config.get("LLM_DEADLINE", 60))
+
+
+class _LatencyWindow:
+    """Recent successful call latencies per route, for the hedge delay."""
+
+    def __init__(self, size=200):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=size))
+
+    def add(self, route, seconds):
+        with self._lock:
+            self._samples[route].append(seconds)
+
+    def percentile(self, route, pct, min_samples):
+        with self._lock:
+            samples = sorted(self._samples.get(route, ()))
+        if len(samples) < max(min_samples, 1):
+            return None
+        return samples[max(0, math.ceil(pct / 100 * len(samples)) - 1)]
+
+
+_latencies = _LatencyWindow()
+_hedge_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("LLM_HEDGE_WORKERS", "32")), thread_name_prefix="llm-hedge"
+)
+
+
+def _with_retries(model, attempt):
+    """Call ``attempt(remaining_seconds)`` until it succeeds, retrying
+    retryable errors up to ``LLM_MAX_RETRIES`` times with full-jitter
+    exponential backoff, but never past the route deadline."""
+    config = current_app.config
+    route = current_route()
+    deadline = time.monotonic() + route_deadline(route)
+    retries = 0
+    while True:
+        try:
+            return attempt(deadline - time.monotonic())
+        except RETRYABLE_ERRORS as exc:
+            delay = random.uniform(0, config.get("LLM_RETRY_BACKOFF", 0.5) * 2 ** retries)
+            retries += 1
+            # leave at least a second for the next attempt
+            if retries > config.get("LLM_MAX_RETRIES", 2) or (
+                deadline - time.monotonic() - delay < 1
+            ):
+                raise
+            LLM_RETRIES.inc(route=route, model=model, reason=type(exc).__name__)
+            current_app.logger.warning(
+                "LLM call for %s failed (%s), retry %d in %.2fs", route, exc, retries, delay
+            )
+            time.sleep(delay)
+
+
+def _hedged(model, fn):
+    """Run ``fn()``; if it has not answered by the route's
+    ``LLM_HEDGE_PERCENTILE`` latency, send a duplicate and take whichever
+    succeeds first. Off while the percentile is 0 or there are fewer than
+    ``LLM_HEDGE_MIN_SAMPLES`` recent calls to estimate it from."""
+    config = current_app.config
+    pct = config.get("LLM_HEDGE_PERCENTILE", 0)
+    if not pct:
+        return fn()
+    route = current_route()
+    delay = _latencies.percentile(route, pct, config.get("LLM_HEDGE_MIN_SAMPLES", 20))
+    if delay is None:
+        return fn()
+
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            g.llm_route = route
+            return fn()
+
+    start = time.perf_counter()
+    try:
+        first = _hedge_pool.submit(run)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+        LLM_HEDGES.inc(route=route, model=model, result="sent")
+        hedge = _hedge_pool.submit(run)
+        pending, error = {first, hedge}, None
+        # the losing request is left to finish on its own; every attempt
+        # carries its own timeout, so this wait is bounded
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        LLM_HEDGES.inc(route=route, model=model, result="won")
+                    return future.result()
+                error = future.exception()
+        raise error
+    finally:
+        add_llm_wait(time.perf_counter() - start)
+
+
+def _create(model, messages, timeout, **kwargs):
+    """One chat completion request, timed and counted."""
+    start = time.perf_counter()
+    with _observe(model) as call:
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            timeout=timeout,
+            **kwargs,
+        )
+        call["usage"] = getattr(response, "usage", None)
+    _latencies.add(current_route(), time.perf_counter() - start)
+    return response
+
+
+def _log_sampled(prompt, text):
+    """Log a full prompt and response for ``LLM_LOG_SAMPLE_RATE`` of calls."""
+    rate = current_app.config.get("LLM_LOG_SAMPLE_RATE", 0)
+    if rate and random.random() < rate:
+        current_app.logger.info("OpenAI prompt: %s", prompt)
+        current_app.logger.info("OpenAI response: %s", text)
+
+
+def _record_usage(route, model, usage):
+    if usage is None:
+        return
+    LLM_TOKENS.inc(usage.prompt_tokens or 0, route=route, model=model, kind="prompt")
+    LLM_TOKENS.inc(usage.completion_tokens or 0, route=route, model=model, kind="completion")
+
+
+@contextmanager
+def _observe(model):
+    """Time one API call and count its outcome; the body stores the reply's
+    ``usage`` in the yielded dict for token accounting."""
+    route = current_route()
+    call = {"usage": None}
+    outcome = "cancelled"
+    start = time.perf_counter()
+    try:
+        yield call
+        outcome = "ok"
+    except APITimeoutError:
+        outcome = "timeout"
+        raise
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        add_llm_wait(elapsed)
+        LLM_LATENCY.observe(elapsed, route=route, model=model)
+        LLM_REQUESTS.inc(route=route, model=model, outcome=outcome)
+        _record_usage(route, model, call["usage"])
+
+
+def complete(prompt, model="gpt-4o", timeout=None, cache=None, **kwargs):
+    """Send a single-message chat completion and return the stripped text.
+
+    ``cache`` names the call site; if that name is enabled in
+    ``LLM_CACHE_ENDPOINTS`` identical requests are answered from ``llm_cache``.
+    """
+    if timeout is None:
+        timeout = current_app.config.get("LLM_CALL_TIMEOUT")
+    messages = [{"role": "user", "content": prompt}]
+    cache_key = None
+    if cache and llm_cache.enabled_for(cache):
+        cache_key = llm_cache.make_key(model, messages, **kwargs)
+        text = llm_cache.get(cache, cache_key)
+        if text is not None:
+            LLM_CACHE_HITS.inc(route=current_route(), model=model)
+            return text
+
+    def attempt(remaining):
+        return _hedged(
+            model, lambda: _create(model, messages, min(timeout, remaining), **kwargs)
+        )
+
+    response = _with_retries(model, attempt)
+    text = response.choices[0].message.content.strip()
+    _log_sampled(prompt, text)
+    if cache_key is not None:
+        llm_cache.set(cache_key, text)
+    return text
+
+
+def complete_stream(prompt, model="gpt-4o", timeout=None, cache=None):
+    """Streaming variant of :func:`complete` yielding text chunks as they arrive.
+
+    A cache hit is yielded as a single chunk; a finished stream is stored in
+    the cache like a regular completion.
+    """
+    if timeout is None:
+        timeout = current_app.config.get("LLM_CALL_TIMEOUT")
+    messages = [{"role": "user", "content": prompt}]
+    cache_key = None
+    if cache and llm_cache.enabled_for(cache):
+        cache_key = llm_cache.make_key(model, messages)
+        text = llm_cache.get(cache, cache_key)
+        if text is not None:
+            LLM_CACHE_HITS.inc(route=current_route(), model=model)
+            yield text
+            return
+    parts = []
+    # timed until the last chunk, so the histogram covers the whole stream
+    with _observe(model) as call:
+        # retried only until the stream opens; once chunks have been
+        # yielded a failure has to reach the caller
+        stream = _with_retries(
+            model,
+            lambda remaining: client.chat.completions.create(
+                model=model,
+                messages=messages,
+                timeout=min(timeout, remaining),
+                stream=True,
+                stream_options={"include_usage": True},
+            ),
+        )
+        for event in stream:
+            # with include_usage the last event has no choices, only usage
+            if getattr(event, "usage", None) is not None:
+                call["usage"] = event.usage
+            if not event.choices:
+                continue
+            chunk = event.choices[0].delta.content
+            if chunk:
+                parts.append(chunk)
+                yield chunk
+    text = "".join(parts).strip()
+    _log_sampled(prompt, text)
+    if cache_key is not None:
+        llm_cache.set(cache_key, text)
+
+
+_background = ThreadPoolExecutor(thread_name_prefix="llm-background")
+
+
+def run_in_background(fn, *args, **kwargs):
+    """Start ``fn`` on a shared worker thread inside the current app context."""
+    app = current_app._get_current_object()
+    route = current_route()
+
+    def run():
+        with app.app_context():
+            g.llm_route = route
+            return fn(*args, **kwargs)
+
+    return _background.submit(run)
+
+
+def fan_out(fn, items, max_workers=None, timeout=None):
+    """Run ``fn`` over ``items`` on a bounded thread pool.
+
+    Results come back in input order. An item whose call raises, or has not
+    finished by the batch deadline, yields ``None`` so callers can skip it
+    without failing the whole batch.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    app = current_app._get_current_object()
+    if max_workers is None:
+        max_workers = app.config.get("LLM_MAX_CONCURRENCY", 5)
+    if timeout is None:
+        # each call is bounded by the route deadline, retries included
+        timeout = route_deadline()
+    max_workers = max(1, min(max_workers, len(items)))
+
+    route = current_route()
+
+    def run(item):
+        with app.app_context():
+            g.llm_route = route
+            return fn(item)
+
+    # every call is bounded by ``timeout`` on its own, so the batch as a whole
+    # can take at most one timeout per wave of ``max_workers`` calls
+    deadline = None
+    if timeout:
+        deadline = timeout * math.ceil(len(items) / max_workers) + 1
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = [executor.submit(run, item) for item in items]
+    start = time.perf_counter()
+    wait(futures, timeout=deadline)
+    add_llm_wait(time.perf_counter() - start)
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    results = []
+    for item, future in zip(items, futures):
+        if not future.done() or future.cancelled():
+            app.logger.warning("LLM call timed out for %r", item)
+            results.append(None)
+            continue
+        exc = future.exception()
+        if exc is not None:
+            app.logger.warning("LLM call failed for %r: %s", item, exc)
+            results.append(None)
+            continue
+        results.append(future.result())
+    return results
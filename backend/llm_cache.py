@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import defaultdict
+
+
+class LLMCache:
+    """SQLite-backed cache of chat completions keyed by model and messages.
+
+    Entries expire after ``LLM_CACHE_TTL`` seconds and the least recently
+    used ones are evicted once the cache holds more than
+    ``LLM_CACHE_MAX_ENTRIES`` rows. Only call sites whose name is listed in
+    ``LLM_CACHE_ENDPOINTS`` read from or write to it.
+    """
+
+    def __init__(self, app=None):
+        self._conn = None
+        self._lock = threading.Lock()
+        self.endpoints = set()
+        self.ttl = 0
+        self.max_entries = 0
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        path = app.config.get("LLM_CACHE_PATH") or os.path.join(
+            app.instance_path, "llm_cache.sqlite3"
+        )
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.endpoints = set(app.config.get("LLM_CACHE_ENDPOINTS", ()))
+        self.ttl = app.config.get("LLM_CACHE_TTL", 86400)
+        self.max_entries = app.config.get("LLM_CACHE_MAX_ENTRIES", 10000)
+
+        conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_llm_cache_last_access ON llm_cache (last_access)"
+        )
+        conn.commit()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = conn
+        app.extensions["llm_cache"] = self
+
+    def enabled_for(self, endpoint):
+        return self._conn is not None and endpoint in self.endpoints
+
+    @staticmethod
+    def make_key(model, messages, **params):
+        blob = json.dumps(
+            {"model": model, "messages": messages, "params": params},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def get(self, endpoint, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses[endpoint] += 1
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits[endpoint] += 1
+            return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, last_access)"
+                " VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            if self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN ("
+                    " SELECT key FROM llm_cache ORDER BY last_access DESC"
+                    " LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        names = sorted(set(self.hits) | set(self.misses))
+        return {
+            "size": size,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "endpoints": {
+                name: {"hits": self.hits[name], "misses": self.misses[name]}
+                for name in names
+            },
+        }
+
+
+llm_cache = LLMCache()
@@ -0,0 +1,297 @@
+"""Drive realistic practice sessions over HTTP against a simulated LLM.
+
+Usage:
+    python loadtest.py [--concurrency 1,4,16] [--sessions 3]
+                       [--llm-latency 0.8] [--llm-jitter 0.3]
+                       [--templates templates.json] [--out results.json]
+
+Starts create_app() on a local port with fake_llm.FakeOpenAI in place of
+the OpenAI client and a throwaway SQLite database (or --database-url).
+At each concurrency level every virtual user runs --sessions rounds of
+the module, vocab and error-review scripts. Latency percentiles and
+throughput per route are printed and saved as JSON for comparing runs.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import fake_llm
+
+
+LANGUAGE = "French"
+CEFR = "B1"
+MODULE = "Passé composé"
+SENTENCES_PER_SESSION = 5
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, route, elapsed_ms, ok):
+        with self._lock:
+            self.latencies[route].append(elapsed_ms)
+            if not ok:
+                self.errors[route] += 1
+
+
+class Client:
+    """Tiny JSON-over-HTTP client that times every call under its route name."""
+
+    def __init__(self, base_url, recorder):
+        self.base_url = base_url
+        self.recorder = recorder
+
+    def call(self, method, route, payload=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        req = urllib.request.Request(
+            self.base_url + route,
+            data=data,
+            method=method,
+            headers={"Content-Type": "application/json"},
+        )
+        start = time.perf_counter()
+        body, ok = None, True
+        try:
+            with urllib.request.urlopen(req, timeout=120) as resp:
+                raw = resp.read()
+            body = json.loads(raw) if raw else None
+        except (urllib.error.URLError, OSError, ValueError):
+            ok = False
+        self.recorder.record(f"{method} {route}", (time.perf_counter() - start) * 1000, ok)
+        return body or {}
+
+
+def module_session(client, user_id, round_no):
+    module = {"language": LANGUAGE, "module": MODULE, "cefr": CEFR}
+    client.call("POST", "/sentence/preload", payload=module)
+    correct = 0
+    for i in range(SENTENCES_PER_SESSION):
+        english = client.call("POST", "/sentence/generate", payload=module).get("sentence") or "Hello"
+        result = client.call(
+            "POST",
+            "/sentence/submit",
+            payload=dict(
+                module,
+                user_id=user_id,
+                english=english,
+                translation=f"Traduction {user_id}-{round_no}-{i}",
+            ),
+        )
+        correct += result.get("correct", 0)
+        if result.get("errors") and result.get("sentence_id"):
+            client.call(
+                "POST",
+                "/errors/save",
+                payload={"sentence_id": result["sentence_id"], "errors": result["errors"]},
+            )
+    client.call(
+        "POST",
+        "/session/complete",
+        payload=dict(
+            module,
+            user_id=user_id,
+            questions_answered=SENTENCES_PER_SESSION,
+            questions_correct=correct,
+        ),
+    )
+
+
+def vocab_session(client, user_id, round_no):
+    lang = {"user_id": user_id, "language": LANGUAGE}
+    words = [f"mot{user_id}-{round_no}-{i}" for i in range(SENTENCES_PER_SESSION)]
+    client.call("POST", "/vocab/add", payload=dict(lang, words=words))
+    client.call(
+        "POST", "/vocab/session/preload", payload=dict(lang, cefr=CEFR, count=SENTENCES_PER_SESSION)
+    )
+    for i in range(SENTENCES_PER_SESSION):
+        item = client.call("POST", "/vocab/session/generate", payload=lang)
+        if not item.get("word_id"):
+            continue
+        client.call(
+            "POST",
+            "/vocab/session/submit",
+            payload=dict(
+                lang,
+                cefr=CEFR,
+                word_id=item["word_id"],
+                english=item.get("sentence") or "Hello",
+                translation=f"Vocab {user_id}-{round_no}-{i}",
+            ),
+        )
+
+
+def error_review_session(client, user_id, round_no):
+    lang = {"user_id": user_id, "language": LANGUAGE}
+    errors = client.call("POST", "/personalized/errors", payload=lang).get("errors", [])
+    for i, err in enumerate(errors[:SENTENCES_PER_SESSION]):
+        sentence = client.call(
+            "POST",
+            "/personalized/error_sentence",
+            payload=dict(lang, cefr=CEFR, error_id=err["id"]),
+        ).get("sentence") or "Hello"
+        client.call(
+            "POST",
+            "/personalized/error_submit",
+            payload=dict(
+                lang,
+                cefr=CEFR,
+                error_id=err["id"],
+                english=sentence,
+                translation=f"Revision {user_id}-{round_no}-{i}",
+            ),
+        )
+
+
+SCRIPTS = [module_session, vocab_session, error_review_session]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    rank = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def summarize(recorder, wall_s):
+    routes = {}
+    for route, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        routes[route] = {
+            "requests": len(values),
+            "errors": recorder.errors.get(route, 0),
+            "p50_ms": round(percentile(values, 50), 1),
+            "p95_ms": round(percentile(values, 95), 1),
+            "p99_ms": round(percentile(values, 99), 1),
+            "throughput_rps": round(len(values) / wall_s, 2) if wall_s else None,
+        }
+    return routes
+
+
+def run_level(base_url, user_ids, sessions):
+    recorder = Recorder()
+    client = Client(base_url, recorder)
+
+    def virtual_user(user_id):
+        for round_no in range(sessions):
+            for script in SCRIPTS:
+                script(client, user_id, round_no)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(user_ids)) as pool:
+        list(pool.map(virtual_user, user_ids))
+    wall_s = time.perf_counter() - start
+    return wall_s, summarize(recorder, wall_s)
+
+
+def print_level(concurrency, wall_s, routes):
+    print(f"\n== concurrency {concurrency}: {wall_s:.1f}s")
+    print(f"{'route':40} {'reqs':>6} {'err':>4} {'p50':>8} {'p95':>8} {'p99':>8} {'rps':>7}")
+    for route, r in routes.items():
+        print(
+            f"{route:40} {r['requests']:6d} {r['errors']:4d} {r['p50_ms']:8.1f}"
+            f" {r['p95_ms']:8.1f} {r['p99_ms']:8.1f} {r['throughput_rps']:7.2f}"
+        )
+
+
+def start_server(app):
+    from werkzeug.serving import make_server
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="1,4,16", help="comma separated virtual user counts")
+    parser.add_argument("--sessions", type=int, default=3, help="script rounds per virtual user")
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="seconds per LLM call")
+    parser.add_argument("--llm-jitter", type=float, default=0.3, help="+/- seconds per LLM call")
+    parser.add_argument("--correct-rate", type=float, default=0.7, help="share of 1 verdicts")
+    parser.add_argument("--templates", help='JSON list of {"pattern": ..., "response": ...}')
+    parser.add_argument("--database-url", help="defaults to a throwaway SQLite file")
+    parser.add_argument("--llm-cache", action="store_true", help="leave the LLM response cache on")
+    parser.add_argument("--out", default="loadtest-results.json")
+    parser.add_argument("--verbose", action="store_true", help="keep request and app logs")
+    args = parser.parse_args()
+    levels = [int(n) for n in args.concurrency.split(",") if n.strip()]
+
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{workdir}/loadtest.db"
+    os.environ["LLM_CACHE_PATH"] = os.path.join(workdir, "llm_cache.sqlite3")
+    if not args.llm_cache:
+        os.environ["LLM_CACHE_ENDPOINTS"] = ""
+    os.environ.setdefault("OPENAI_API_KEY", "loadtest")
+
+    templates = []
+    if args.templates:
+        with open(args.templates) as f:
+            templates = json.load(f)
+    fake = fake_llm.install(
+        fake_llm.FakeOpenAI(args.llm_latency, args.llm_jitter, templates, args.correct_rate)
+    )
+
+    from app import create_app
+
+    app = create_app()
+    if not args.verbose:
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        app.logger.setLevel(logging.WARNING)
+    server, base_url = start_server(app)
+    setup = Client(base_url, Recorder())
+    run_id = int(time.time())
+
+    results = []
+    try:
+        for concurrency in levels:
+            user_ids = [
+                setup.call("POST", "/users", payload={"name": f"load-{run_id}-{concurrency}-{i}"})["id"]
+                for i in range(concurrency)
+            ]
+            calls_before = fake.calls
+            wall_s, routes = run_level(base_url, user_ids, args.sessions)
+            print_level(concurrency, wall_s, routes)
+            results.append(
+                {
+                    "concurrency": concurrency,
+                    "wall_s": round(wall_s, 2),
+                    "llm_calls": fake.calls - calls_before,
+                    "routes": routes,
+                }
+            )
+    finally:
+        server.shutdown()
+
+    report = {
+        "started_at": run_id,
+        "config": {
+            "sessions": args.sessions,
+            "llm_latency": args.llm_latency,
+            "llm_jitter": args.llm_jitter,
+            "correct_rate": args.correct_rate,
+            "database": "sqlite" if not args.database_url else args.database_url.split(":")[0],
+            "llm_cache": args.llm_cache,
+            "python": sys.version.split()[0],
+        },
+        "levels": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nsaved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
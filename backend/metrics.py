@@ -0,0 +1,166 @@
+"""Process-local counters and histograms rendered in the Prometheus text
+exposition format.
+
+Values live in this process only; with several workers, scrape each one
+(or run a single worker) the same way as for any other in-process
+Prometheus client.
+"""
+import math
+import threading
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts, sum, count]
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(
+                        self.labelnames, key, [("le", _format_value(float(bound)))]
+                    )
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+LLM_REQUESTS = registry.register(
+    Counter(
+        "llm_requests_total",
+        "LLM completion calls by route, model and outcome (ok, error, timeout).",
+        ["route", "model", "outcome"],
+    )
+)
+LLM_LATENCY = registry.register(
+    Histogram(
+        "llm_request_duration_seconds",
+        "Wall time of LLM completion calls, including streamed ones.",
+        ["route", "model"],
+    )
+)
+LLM_TOKENS = registry.register(
+    Counter(
+        "llm_tokens_total",
+        "Tokens reported by the LLM API by route, model and kind (prompt, completion).",
+        ["route", "model", "kind"],
+    )
+)
+LLM_CACHE_HITS = registry.register(
+    Counter(
+        "llm_cache_hits_total",
+        "LLM calls answered from the response cache instead of the API.",
+        ["route", "model"],
+    )
+)
+LLM_RETRIES = registry.register(
+    Counter(
+        "llm_retries_total",
+        "LLM calls retried after a timeout, connection, rate limit or server error.",
+        ["route", "model", "reason"],
+    )
+)
+LLM_HEDGES = registry.register(
+    Counter(
+        "llm_hedges_total",
+        "Hedged duplicate LLM requests sent, and how many of them answered first.",
+        ["route", "model", "result"],
+    )
+)
+JUDGE_DECISIONS = registry.register(
+    Counter(
+        "grading_judge_decisions_total",
+        "1/0 verdicts settled by a local judge rule, or by the LLM judge (rule=llm_judge).",
+        ["route", "rule"],
+    )
+)
+LOCAL_GRADES = registry.register(
+    Counter(
+        "grading_local_total",
+        "Submissions checked against reference translations by outcome"
+        " (match, escalated, no_reference).",
+        ["route", "outcome"],
+    )
+)
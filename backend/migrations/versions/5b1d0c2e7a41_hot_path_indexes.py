@@ -0,0 +1,108 @@
+"""hot path indexes
+
+Revision ID: 5b1d0c2e7a41
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1d0c2e7a41'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ("ix_sentence_user_id_timestamp", "sentence", ["user_id", "timestamp"], False),
+    ("ix_error_module_id", "error", ["module_id"], False),
+    ("ix_error_sentence_id", "error", ["sentence_id"], False),
+    (
+        "ix_vocab_word_user_id_language_last_correct",
+        "vocab_word",
+        ["user_id", "language", "last_correct"],
+        False,
+    ),
+    ("ix_module_result_user_id_timestamp", "module_result", ["user_id", "timestamp"], False),
+    ("uq_module_name_language", "module", ["name", "language"], True),
+    ("uq_vocab_word_user_language_word", "vocab_word", ["user_id", "language", "word"], True),
+]
+
+
+def _existing_names(inspector, table):
+    names = {ix["name"] for ix in inspector.get_indexes(table)}
+    names |= {uq["name"] for uq in inspector.get_unique_constraints(table)}
+    return names
+
+
+def _merge_duplicate_modules(bind):
+    """Fold modules sharing (name, language) into the lowest id before the
+    unique index is built; get-or-create races could insert duplicates."""
+    groups = bind.execute(sa.text(
+        "SELECT name, language, MIN(id) FROM module"
+        " GROUP BY name, language HAVING COUNT(*) > 1"
+    )).fetchall()
+    for name, language, keep in groups:
+        dupes = [row[0] for row in bind.execute(
+            sa.text("SELECT id FROM module WHERE name = :name AND language = :language AND id != :keep"),
+            {"name": name, "language": language, "keep": keep},
+        )]
+        keep_has_instruction = bind.execute(
+            sa.text("SELECT 1 FROM instruction WHERE module_id = :keep"), {"keep": keep}
+        ).first() is not None
+        for dupe in dupes:
+            params = {"keep": keep, "dupe": dupe}
+            for table in ("sentence", "error", "module_result"):
+                bind.execute(
+                    sa.text(f"UPDATE {table} SET module_id = :keep WHERE module_id = :dupe"),
+                    params,
+                )
+            if keep_has_instruction:
+                bind.execute(sa.text("DELETE FROM instruction WHERE module_id = :dupe"), params)
+            else:
+                moved = bind.execute(
+                    sa.text("UPDATE instruction SET module_id = :keep WHERE module_id = :dupe"),
+                    params,
+                ).rowcount
+                keep_has_instruction = bool(moved)
+            bind.execute(sa.text("DELETE FROM module WHERE id = :dupe"), params)
+
+
+def _drop_duplicate_vocab(bind):
+    bind.execute(sa.text(
+        "DELETE FROM vocab_word WHERE id NOT IN ("
+        " SELECT keep_id FROM ("
+        "  SELECT MIN(id) AS keep_id FROM vocab_word GROUP BY user_id, language, word"
+        " ) AS keep)"
+    ))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    _merge_duplicate_modules(bind)
+    _drop_duplicate_vocab(bind)
+
+    inspector = sa.inspect(bind)
+    for name, table, columns, unique in INDEXES:
+        # databases built by db.create_all() may already have these
+        if name not in _existing_names(inspector, table):
+            op.create_index(name, table, columns, unique=unique)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns, unique in reversed(INDEXES):
+        plain = {
+            ix["name"]
+            for ix in inspector.get_indexes(table)
+            if not ix.get("duplicates_constraint")
+        }
+        if name in plain:
+            op.drop_index(name, table_name=table)
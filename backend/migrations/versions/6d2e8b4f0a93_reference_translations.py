@@ -0,0 +1,44 @@
+"""reference translations
+
+Revision ID: 6d2e8b4f0a93
+Revises: 9a3c5e7b1f48
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d2e8b4f0a93'
+down_revision: Union[str, None] = '9a3c5e7b1f48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+NAME = "ix_reference_translation_language_english_text"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if "reference_translation" not in inspector.get_table_names():
+        op.create_table(
+            "reference_translation",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("language", sa.String(length=20), nullable=False),
+            sa.Column("english_text", sa.Text(), nullable=False),
+            sa.Column("translation", sa.Text(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+        )
+        inspector = sa.inspect(op.get_bind())
+    if NAME not in {ix["name"] for ix in inspector.get_indexes("reference_translation")}:
+        op.create_index(NAME, "reference_translation", ["language", "english_text"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(NAME, table_name="reference_translation")
+    op.drop_table("reference_translation")
@@ -0,0 +1,110 @@
+"""delta sync sequence columns and tombstones
+
+Revision ID: 8e2f4a9c1d37
+Revises: 5b1d0c2e7a41
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e2f4a9c1d37'
+down_revision: Union[str, None] = '5b1d0c2e7a41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    error_columns = {c["name"] for c in inspector.get_columns("error")}
+    # batch mode so SQLite can add the foreign key by copying the table
+    with op.batch_alter_table("error") as batch:
+        if "user_id" not in error_columns:
+            batch.add_column(sa.Column("user_id", sa.Integer(), nullable=True))
+            batch.create_foreign_key("fk_error_user_id_user", "user", ["user_id"], ["id"])
+        if "sync_seq" not in error_columns:
+            batch.add_column(sa.Column("sync_seq", sa.Integer(), nullable=True))
+    if "sync_seq" not in {c["name"] for c in inspector.get_columns("vocab_word")}:
+        op.add_column("vocab_word", sa.Column("sync_seq", sa.Integer(), nullable=True))
+
+    if "sync_counter" not in tables:
+        op.create_table(
+            "sync_counter",
+            sa.Column("name", sa.String(length=120), primary_key=True),
+            sa.Column("value", sa.Integer(), nullable=False),
+        )
+    if "sync_tombstone" not in tables:
+        op.create_table(
+            "sync_tombstone",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("entity", sa.String(length=20), nullable=False),
+            sa.Column("entity_id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("language", sa.String(length=20), nullable=True),
+            sa.Column("sync_seq", sa.Integer(), nullable=False),
+            sa.Column("deleted_at", sa.DateTime(), nullable=True),
+        )
+
+    # existing rows: copy the owner from the sentence and use the row id as a
+    # sequence number that is already unique per table, then start every
+    # user's counter above all of them
+    bind.execute(sa.text(
+        "UPDATE error SET user_id = (SELECT sentence.user_id FROM sentence"
+        " WHERE sentence.id = error.sentence_id) WHERE user_id IS NULL"
+    ))
+    bind.execute(sa.text("UPDATE error SET sync_seq = id WHERE sync_seq IS NULL"))
+    bind.execute(sa.text("UPDATE vocab_word SET sync_seq = id WHERE sync_seq IS NULL"))
+    start = bind.execute(sa.text(
+        "SELECT MAX(m) FROM ("
+        " SELECT MAX(id) AS m FROM error UNION ALL SELECT MAX(id) AS m FROM vocab_word"
+        ") AS ids"
+    )).scalar() or 0
+    bind.execute(
+        sa.text(
+            "INSERT INTO sync_counter (name, value)"
+            " SELECT 'sync:' || CAST(user_id AS VARCHAR(20)), :start FROM ("
+            "  SELECT user_id FROM error WHERE user_id IS NOT NULL"
+            "  UNION SELECT user_id FROM vocab_word"
+            " ) AS owners"
+            " WHERE NOT EXISTS (SELECT 1 FROM sync_counter"
+            "  WHERE sync_counter.name = 'sync:' || CAST(owners.user_id AS VARCHAR(20)))"
+        ),
+        {"start": start},
+    )
+
+    inspector = sa.inspect(bind)
+    wanted = [
+        ("ix_error_user_id_sync_seq", "error", ["user_id", "sync_seq"]),
+        ("ix_vocab_word_user_id_sync_seq", "vocab_word", ["user_id", "sync_seq"]),
+        (
+            "ix_sync_tombstone_user_id_entity_sync_seq",
+            "sync_tombstone",
+            ["user_id", "entity", "sync_seq"],
+        ),
+    ]
+    for name, table, columns in wanted:
+        if name not in {ix["name"] for ix in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_sync_tombstone_user_id_entity_sync_seq", table_name="sync_tombstone")
+    op.drop_index("ix_vocab_word_user_id_sync_seq", table_name="vocab_word")
+    op.drop_index("ix_error_user_id_sync_seq", table_name="error")
+    op.drop_table("sync_tombstone")
+    op.drop_table("sync_counter")
+    with op.batch_alter_table("vocab_word") as batch:
+        batch.drop_column("sync_seq")
+    with op.batch_alter_table("error") as batch:
+        batch.drop_constraint("fk_error_user_id_user", type_="foreignkey")
+        batch.drop_column("sync_seq")
+        batch.drop_column("user_id")
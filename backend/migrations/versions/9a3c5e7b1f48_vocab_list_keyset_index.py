@@ -0,0 +1,33 @@
+"""vocab list keyset index
+
+Revision ID: 9a3c5e7b1f48
+Revises: 3f6b9d2a8c15
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a3c5e7b1f48'
+down_revision: Union[str, None] = '3f6b9d2a8c15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+NAME = "ix_vocab_word_user_id_language_added_at_id"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if NAME not in {ix["name"] for ix in inspector.get_indexes("vocab_word")}:
+        op.create_index(NAME, "vocab_word", ["user_id", "language", "added_at", "id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(NAME, table_name="vocab_word")
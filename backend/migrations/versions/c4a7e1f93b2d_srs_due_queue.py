@@ -0,0 +1,70 @@
+"""spaced repetition due queue
+
+Revision ID: c4a7e1f93b2d
+Revises: 8e2f4a9c1d37
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a7e1f93b2d'
+down_revision: Union[str, None] = '8e2f4a9c1d37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (table, time of the last correct answer)
+TABLES = [("vocab_word", "last_correct"), ("error", "last_reviewed_correctly")]
+
+INDEXES = [
+    ("ix_vocab_word_user_id_language_next_due", "vocab_word", ["user_id", "language", "next_due"]),
+    ("ix_error_user_id_next_due", "error", ["user_id", "next_due"]),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    for table, last_correct in TABLES:
+        columns = {c["name"] for c in inspector.get_columns(table)}
+        if "ease" not in columns:
+            op.add_column(table, sa.Column("ease", sa.Float(), nullable=True))
+        if "interval_days" not in columns:
+            op.add_column(table, sa.Column("interval_days", sa.Float(), nullable=True))
+        if "next_due" not in columns:
+            op.add_column(table, sa.Column("next_due", sa.DateTime(), nullable=True))
+        # never answered correctly first, then the longest since the last
+        # correct answer. This is the old vocab order. Errors used to come
+        # most recently reviewed correctly first, and that order changes on
+        # purpose: a due queue serves the most overdue item first
+        bind.execute(
+            sa.text(
+                f"UPDATE {table} SET ease = COALESCE(ease, 2.5),"
+                f" interval_days = COALESCE(interval_days, 0),"
+                f" next_due = COALESCE(next_due, {last_correct}, :epoch)"
+            ),
+            {"epoch": datetime(1970, 1, 1)},
+        )
+
+    inspector = sa.inspect(bind)
+    for name, table, columns in INDEXES:
+        if name not in {ix["name"] for ix in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
+    for table, last_correct in TABLES:
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column("next_due")
+            batch.drop_column("interval_days")
+            batch.drop_column("ease")
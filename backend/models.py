@@ -22,6 +22,8 @@ class Course(db.Model):
 
 
 class Chapter(db.Model):
+    __table_args__ = (db.Index("ix_chapter_course_id", "course_id"),)
+
     id = db.Column(db.Integer, primary_key=True)
     course_id = db.Column(db.Integer, db.ForeignKey("course.id"), nullable=False)
     name = db.Column(db.String(120), nullable=False)
@@ -31,6 +33,11 @@ class Chapter(db.Model):
     )
 
 class Module(db.Model):
+    __table_args__ = (
+        db.Index("uq_module_name_language", "name", "language", unique=True),
+        db.Index("ix_module_chapter_id", "chapter_id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
     description = db.Column(db.Text)
@@ -39,6 +46,10 @@ class Module(db.Model):
 
 
 class Sentence(db.Model):
+    __table_args__ = (
+        db.Index("ix_sentence_user_id_timestamp", "user_id", "timestamp"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     module_id = db.Column(db.Integer, db.ForeignKey('module.id'), nullable=False)
@@ -53,21 +64,38 @@ class Sentence(db.Model):
 
 
 class Error(db.Model):
+    __table_args__ = (
+        db.Index("ix_error_module_id", "module_id"),
+        db.Index("ix_error_sentence_id", "sentence_id"),
+        db.Index("ix_error_user_id_sync_seq", "user_id", "sync_seq"),
+        db.Index("ix_error_user_id_next_due", "user_id", "next_due"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     sentence_id = db.Column(db.Integer, db.ForeignKey('sentence.id'), nullable=False)
+    # denormalised from Sentence.user_id so per-user queries skip the join
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     error_text = db.Column(db.Text)
     module_id = db.Column(db.Integer, db.ForeignKey('module.id'), nullable=False)
     last_reviewed = db.Column(db.DateTime, nullable=True)
     last_reviewed_correctly = db.Column(db.DateTime, nullable=True)
     review_count = db.Column(db.Integer, default=0)
     correct_review_count = db.Column(db.Integer, default=0)
-
+    sync_seq = db.Column(db.Integer)
+    # spaced repetition state, see srs.schedule
+    ease = db.Column(db.Float, default=2.5)
+    interval_days = db.Column(db.Float, default=0)
+    next_due = db.Column(db.DateTime, default=datetime.utcnow)
 
     sentence = db.relationship('Sentence', backref=db.backref('errors', lazy=True))
     module = db.relationship('Module', backref=db.backref('errors', lazy=True))
 
 
 class ModuleResult(db.Model):
+    __table_args__ = (
+        db.Index("ix_module_result_user_id_timestamp", "user_id", "timestamp"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -89,6 +117,16 @@ class Instruction(db.Model):
 
 
 class VocabWord(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "language", "word", name="uq_vocab_word_user_language_word"),
+        db.Index("ix_vocab_word_user_id_language_last_correct", "user_id", "language", "last_correct"),
+        db.Index("ix_vocab_word_user_id_sync_seq", "user_id", "sync_seq"),
+        db.Index("ix_vocab_word_user_id_language_next_due", "user_id", "language", "next_due"),
+        db.Index(
+            "ix_vocab_word_user_id_language_added_at_id", "user_id", "language", "added_at", "id"
+        ),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     language = db.Column(db.String(20), nullable=False)
@@ -98,5 +136,57 @@ class VocabWord(db.Model):
     last_correct = db.Column(db.DateTime)
     review_count = db.Column(db.Integer, default=0)
     correct_count = db.Column(db.Integer, default=0)
+    sync_seq = db.Column(db.Integer)
+    # spaced repetition state, see srs.schedule
+    ease = db.Column(db.Float, default=2.5)
+    interval_days = db.Column(db.Float, default=0)
+    next_due = db.Column(db.DateTime, default=datetime.utcnow)
 
     user = db.relationship('User', backref=db.backref('vocab_words', lazy=True))
+
+
+class PooledSentence(db.Model):
+    """A pre-generated practice item waiting to be served, shared by all workers."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    pool_key = db.Column(db.String(255), nullable=False, index=True)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ReferenceTranslation(db.Model):
+    """A target-language translation generated alongside a practice sentence,
+    used to grade matching submissions without an LLM call."""
+
+    __table_args__ = (
+        db.Index("ix_reference_translation_language_english_text", "language", "english_text"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    language = db.Column(db.String(20), nullable=False)
+    english_text = db.Column(db.Text, nullable=False)
+    translation = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class SyncCounter(db.Model):
+    """Named monotonically increasing counter, e.g. one sync sequence per user."""
+
+    name = db.Column(db.String(120), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+
+class SyncTombstone(db.Model):
+    """Records a deleted VocabWord or Error so delta-sync clients can drop it."""
+
+    __table_args__ = (
+        db.Index("ix_sync_tombstone_user_id_entity_sync_seq", "user_id", "entity", "sync_seq"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    language = db.Column(db.String(20))
+    sync_seq = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
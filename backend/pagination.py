@@ -0,0 +1,87 @@
+import base64
+import json
+from datetime import datetime
+
+from flask import request
+from sqlalchemy import literal, tuple_
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(values):
+    """Opaque cursor for the key ``values`` of the last row of a page."""
+    values = [{"dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Inverse of :func:`encode_cursor`; raises ``ValueError`` on garbage."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (TypeError, UnicodeError, ValueError) as exc:
+        raise ValueError("invalid cursor") from exc
+    if not isinstance(values, list):
+        raise ValueError("invalid cursor")
+    try:
+        return [
+            datetime.fromisoformat(v["dt"]) if isinstance(v, dict) else v for v in values
+        ]
+    except (KeyError, TypeError, ValueError) as exc:
+        raise ValueError("invalid cursor") from exc
+
+
+def key_of(row, key_columns):
+    return [getattr(row, column.key) for column in key_columns]
+
+
+def after(query, key_columns, values, descending=False):
+    """Restrict ``query`` to rows past ``values`` in ``key_columns`` order and
+    apply that order, so the next page starts with an index seek instead of
+    skipping over every earlier row like OFFSET does."""
+    if values is not None:
+        if len(values) != len(key_columns):
+            raise ValueError("invalid cursor")
+        key = tuple_(*key_columns)
+        bound = tuple_(*(literal(v, c.type) for c, v in zip(key_columns, values)))
+        query = query.filter(key < bound if descending else key > bound)
+    order = [c.desc() if descending else c for c in key_columns]
+    return query.order_by(*order)
+
+
+def page_args():
+    """``(limit, cursor values)`` from the query string, or ``None`` when the
+    client asked for neither and expects the whole list as before."""
+    cursor = request.args.get("cursor")
+    limit = request.args.get("limit", type=int)
+    if cursor is None and limit is None:
+        return None
+    limit = min(max(limit or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    return limit, decode_cursor(cursor) if cursor else None
+
+
+def paginate(query, key_columns, limit, values, descending=False):
+    """One keyset page of ``query``: ``(rows, next_cursor)``, where
+    ``next_cursor`` is ``None`` on the last page."""
+    rows = after(query, key_columns, values, descending).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(key_of(rows[-1], key_columns))
+
+
+def iter_keyset(query, key_columns, chunk_size):
+    """Yield every row of ``query`` in key order, one short keyset query per
+    chunk, so a long export never holds a cursor or transaction open."""
+    values = None
+    while True:
+        rows = after(query, key_columns, values).limit(chunk_size).all()
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        values = key_of(rows[-1], key_columns)
+        # end the read transaction between chunks
+        query.session.rollback()
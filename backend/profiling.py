@@ -0,0 +1,147 @@
+import os
+import time
+import random
+import cProfile
+import threading
+from flask import current_app, request, has_request_context
+
+from query_stats import STATS_KEY, RequestQueryStats
+
+
+PROFILE_KEY = "request_profile"
+
+# cProfile can only run one profiler per interpreter on Python 3.12+, and
+# one per thread would still see the other requests' calls, so only one
+# request at a time gets a dump; the others just get the time split
+_profiler_lock = threading.Lock()
+
+
+class RequestProfile:
+    def __init__(self, dump):
+        self.start = time.perf_counter()
+        self.llm_ms = 0.0
+        self.finished = False
+        self.profiler = None
+        if dump and _profiler_lock.acquire(blocking=False):
+            self.profiler = cProfile.Profile()
+            try:
+                self.profiler.enable()
+            except ValueError:
+                # another profiling tool (a debugger, a sampling profiler)
+                # already holds the interpreter's profiling hook
+                self.profiler = None
+                _profiler_lock.release()
+
+    def stop(self):
+        """Disable the profiler and let the next request have it; returns the
+        profiler to dump, or ``None``."""
+        profiler, self.profiler = self.profiler, None
+        if profiler is not None:
+            profiler.disable()
+            _profiler_lock.release()
+        return profiler
+
+    def buckets(self, sql_ms):
+        wall_ms = (time.perf_counter() - self.start) * 1000
+        python_ms = max(wall_ms - sql_ms - self.llm_ms, 0.0)
+        return wall_ms, sql_ms, self.llm_ms, python_ms
+
+
+def add_llm_wait(seconds):
+    """Charge ``seconds`` the request thread spent waiting on the LLM to the
+    current request's profile, if it is being profiled."""
+    if not has_request_context():
+        return
+    profile = request.environ.get(PROFILE_KEY)
+    if profile is not None:
+        profile.llm_ms += seconds * 1000
+
+
+def _start():
+    config = current_app.config
+    rate = config.get("PROFILING_SAMPLE_RATE", 0)
+    if request.headers.get("X-Profile") != "1" and not (rate and random.random() < rate):
+        return
+    profile = RequestProfile(dump=bool(config.get("PROFILING_DUMP_DIR")))
+    request.environ[PROFILE_KEY] = profile
+    # SQL time comes from the query_stats cursor hooks
+    request.environ.setdefault(STATS_KEY, RequestQueryStats())
+
+
+def _dump(app, endpoint, profiler):
+    directory = os.path.join(app.config["PROFILING_DUMP_DIR"], endpoint)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{time.time():.6f}-{os.getpid()}.prof")
+    profiler.dump_stats(path)
+
+
+def _report(app, endpoint, label, profile, stats, response=None):
+    profiler = profile.stop()
+    wall_ms, sql_ms, llm_ms, python_ms = profile.buckets(stats.total_ms)
+    if response is not None:
+        response.headers["X-Profile-Wall-Ms"] = f"{wall_ms:.1f}"
+        response.headers["X-Profile-SQL-Ms"] = f"{sql_ms:.1f}"
+        response.headers["X-Profile-LLM-Ms"] = f"{llm_ms:.1f}"
+        response.headers["X-Profile-Python-Ms"] = f"{python_ms:.1f}"
+    app.logger.info(
+        "Profile %s: wall=%.0fms sql=%.0fms llm=%.0fms python=%.0fms",
+        label,
+        wall_ms,
+        sql_ms,
+        llm_ms,
+        python_ms,
+    )
+    if profiler is not None:
+        _dump(app, endpoint, profiler)
+
+
+def _finish(response):
+    profile = request.environ.get(PROFILE_KEY)
+    if profile is None:
+        return response
+    profile.finished = True
+    app = current_app._get_current_object()
+    stats = request.environ[STATS_KEY]
+    endpoint = (request.endpoint or "unknown").replace("/", "_")
+    label = f"{request.method} {request.path}"
+    if response.is_streamed:
+        # the profiler has to keep running while the body is generated
+        response.call_on_close(lambda: _report(app, endpoint, label, profile, stats))
+        return response
+    _report(app, endpoint, label, profile, stats, response)
+    return response
+
+
+def init_profiling(app, blueprint):
+    """Split sampled requests to ``blueprint`` into SQL, LLM and Python time.
+
+    Does nothing unless ``PROFILING_ENABLED`` is set, so there is no
+    per-request cost when profiling is off. When on, a request is profiled
+    if it sends ``X-Profile: 1`` or wins the ``PROFILING_SAMPLE_RATE`` draw.
+    The split goes to the log and to ``X-Profile-*`` response headers, and
+    with ``PROFILING_DUMP_DIR`` set a cProfile dump of the request thread is
+    written to ``<dir>/<endpoint>/``; see summarize_profiles.py. Only one
+    request per process is cProfiled at a time; sampled requests that
+    overlap it get the split without a dump.
+    """
+    if not app.config.get("PROFILING_ENABLED"):
+        return
+
+    @app.before_request
+    def start_profile():
+        if request.blueprint == blueprint.name:
+            _start()
+
+    @app.after_request
+    def finish_profile(response):
+        if request.blueprint == blueprint.name:
+            return _finish(response)
+        return response
+
+    @app.teardown_request
+    def release_profiler(exc):
+        # a request that never reached finish_profile must not keep the
+        # profiler from every later one
+        profile = request.environ.get(PROFILE_KEY)
+        if profile is not None and not profile.finished:
+            profile.stop()
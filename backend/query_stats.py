@@ -0,0 +1,99 @@
+import time
+from collections import Counter
+from flask import current_app, request, has_request_context
+from sqlalchemy import event
+
+from models import db
+
+
+STATS_KEY = "query_stats"
+
+
+class RequestQueryStats:
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.statements = Counter()
+
+    def n_plus_one_suspects(self, threshold):
+        return {sql: n for sql, n in self.statements.items() if n >= threshold}
+
+
+def _current_stats():
+    if not has_request_context():
+        return None
+    return request.environ.get(STATS_KEY)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats()
+    if stats is None:
+        return
+    starts = conn.info.get("query_start")
+    if starts:
+        stats.total_ms += (time.perf_counter() - starts.pop()) * 1000
+    stats.count += 1
+    stats.statements[statement] += 1
+
+
+def _start():
+    config = current_app.config
+    if config.get("QUERY_STATS_ENABLED") or request.headers.get("X-Query-Stats") == "1":
+        request.environ[STATS_KEY] = RequestQueryStats()
+
+
+def _report(app, label, stats, response=None):
+    threshold = app.config.get("QUERY_STATS_N1_THRESHOLD", 3)
+    suspects = stats.n_plus_one_suspects(threshold)
+    if response is not None:
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = f"{stats.total_ms:.1f}"
+        response.headers["X-DB-N1-Suspects"] = str(len(suspects))
+    app.logger.info("%s: %d queries, %.1fms in db", label, stats.count, stats.total_ms)
+    for sql, n in suspects.items():
+        app.logger.warning("Possible N+1 on %s: %d x %s", label, n, sql)
+
+
+def _finish(response):
+    stats = request.environ.get(STATS_KEY)
+    if stats is None:
+        return response
+    app = current_app._get_current_object()
+    label = f"{request.method} {request.path}"
+    if response.is_streamed:
+        # the body (and its queries) is produced after this hook, so the
+        # numbers are only complete once the response has been sent
+        response.call_on_close(lambda: _report(app, label, stats))
+        return response
+    _report(app, label, stats, response)
+    return response
+
+
+def init_query_stats(app, blueprint):
+    """Record per-request SQL statement counts and time for ``blueprint``.
+
+    Enabled for every request with ``QUERY_STATS_ENABLED`` or per request
+    with an ``X-Query-Stats: 1`` header. Results go to the log and, for
+    non-streamed responses, to ``X-DB-*`` response headers. Statements run
+    at least ``QUERY_STATS_N1_THRESHOLD`` times in one request are logged
+    as N+1 suspects.
+    """
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(db.engine, "after_cursor_execute", _after_cursor_execute)
+
+    @app.before_request
+    def start_query_stats():
+        if request.blueprint == blueprint.name:
+            _start()
+
+    @app.after_request
+    def finish_query_stats(response):
+        if request.blueprint == blueprint.name:
+            return _finish(response)
+        return response
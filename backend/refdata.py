@@ -0,0 +1,137 @@
+import time
+import threading
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import db, Instruction, Module
+
+
+class RefDataCache:
+    """In-process cache of module ids by (name, language) and instruction
+    text by module id.
+
+    Entries are dropped once a commit that touched the module or its
+    instruction goes through, from any code path, and expire after
+    ``REFDATA_CACHE_TTL`` seconds so changes made by other processes are
+    picked up too.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._module_ids = {}
+        self._instructions = {}
+        # bumped by every invalidation, so a lookup that raced with one does
+        # not put its possibly stale result back
+        self._generation = 0
+
+    def _ttl(self):
+        return current_app.config.get("REFDATA_CACHE_TTL", 300)
+
+    def _get(self, entries, key):
+        """``(value, generation)``; value is ``None`` on a miss."""
+        with self._lock:
+            entry = entries.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                del entries[key]
+                entry = None
+            return (entry[0] if entry else None), self._generation
+
+    def _put(self, entries, key, value, generation):
+        ttl = self._ttl()
+        with self._lock:
+            if generation == self._generation:
+                entries[key] = (value, time.monotonic() + ttl)
+
+    def module_id(self, name, language):
+        """Id of the module called ``name`` in ``language``, creating it if
+        needed. Concurrent creators lose on uq_module_name_language and read
+        back the winner's row, so no duplicate is ever committed."""
+        key = (name, language)
+        module_id, generation = self._get(self._module_ids, key)
+        if module_id is not None:
+            return module_id
+
+        def lookup():
+            return db.session.scalar(
+                db.select(Module.id).where(Module.name == name, Module.language == language)
+            )
+
+        module_id = lookup()
+        if module_id is None:
+            module = Module(name=name, language=language)
+            db.session.add(module)
+            try:
+                db.session.flush()
+                module_id = module.id
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                module_id = lookup()
+            # our own commit invalidated the name
+            generation = self._generation
+        self._put(self._module_ids, key, module_id, generation)
+        return module_id
+
+    def instruction_text(self, module_id):
+        """Saved instruction text of a module, or ``None`` if there is none."""
+        text, generation = self._get(self._instructions, module_id)
+        if text is not None:
+            return text
+        text = db.session.scalar(
+            db.select(Instruction.text).where(Instruction.module_id == module_id)
+        )
+        if text is not None:
+            self._put(self._instructions, module_id, text, generation)
+        return text
+
+    def invalidate(self, module_ids=(), names=(), instruction_module_ids=()):
+        """Drop everything cached about ``module_ids`` and the ``names`` they
+        had, and the instruction text of ``instruction_module_ids``."""
+        with self._lock:
+            self._generation += 1
+            for module_id in set(module_ids) | set(instruction_module_ids):
+                self._instructions.pop(module_id, None)
+            stale = set(names)
+            stale.update(k for k, (v, _) in self._module_ids.items() if v in module_ids)
+            for key in stale:
+                self._module_ids.pop(key, None)
+
+
+refdata = RefDataCache()
+
+
+_INFO_KEYS = ("refdata_module_ids", "refdata_names", "refdata_instruction_module_ids")
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_refdata_changes(session, flush_context, instances):
+    """Note which modules and instructions a flush touches; the cache is only
+    invalidated once the transaction commits, so readers never re-cache
+    uncommitted state."""
+    module_ids, names, instruction_module_ids = (
+        session.info.setdefault(key, set()) for key in _INFO_KEYS
+    )
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Module):
+            if obj.id is not None:
+                module_ids.add(obj.id)
+            names.add((obj.name, obj.language))
+            history = db.inspect(obj).attrs.name.history
+            names.update((old, obj.language) for old in history.deleted or ())
+        elif isinstance(obj, Instruction):
+            instruction_module_ids.add(obj.module_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_refdata(session):
+    changes = [session.info.pop(key, None) or () for key in _INFO_KEYS]
+    if any(changes):
+        refdata.invalidate(*changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_refdata_changes(session):
+    for key in _INFO_KEYS:
+        session.info.pop(key, None)
@@ -0,0 +1,168 @@
+"""Reference translations generated with practice sentences, and a local
+first pass that grades submissions matching one of them.
+
+Sentence generation asks for ``REFERENCE_TRANSLATIONS`` translations of each
+sentence next to the English. On submit, the learner's translation is
+compared with those references by token edit distance after normalizing
+case, punctuation and accents; a close enough match is graded correct on
+the spot, anything else escalates to the LLM correction and judge.
+"""
+import json
+import re
+import unicodedata
+
+from flask import current_app
+
+from judge_rules import normalize
+from llm import complete, current_route
+from metrics import LOCAL_GRADES
+from models import db, ReferenceTranslation
+
+
+GENERATION_SUFFIX = """
+
+For each sentence, also give {count} natural {language} translation(s) that a
+teacher would accept as fully correct. Respond with a JSON object with one
+key, "sentences": a list of objects with the keys
+"english": the English sentence,
+"translations": a list of {language} translations of it.
+"""
+
+CORRECT_RESPONSE = "No corrections needed"
+
+
+def generation_suffix(language):
+    """Prompt suffix asking for reference translations, or ``""`` when
+    ``REFERENCE_TRANSLATIONS`` is 0."""
+    count = current_app.config.get("REFERENCE_TRANSLATIONS", 2)
+    if not count:
+        return ""
+    return GENERATION_SUFFIX.format(count=count, language=language)
+
+
+def generate(prompt, language):
+    """Ask for ``prompt``'s sentences with reference translations and return
+    ``[(english, [translations])]``, or ``None`` when references are off or
+    the reply is unusable, in which case the caller asks again with the
+    plain numbered-list prompt."""
+    suffix = generation_suffix(language)
+    if not suffix:
+        return None
+    text = complete(prompt + suffix, response_format={"type": "json_object"})
+    items = parse_generated(text)
+    if not items:
+        current_app.logger.warning(
+            "Sentence generation reply had no usable sentences, asking without references"
+        )
+        return None
+    return items
+
+
+def parse_generated(text):
+    """``[(english, [translations])]`` from a generation reply in the
+    :data:`GENERATION_SUFFIX` format, or ``None`` if it is not in that format."""
+    try:
+        sentences = json.loads(text)["sentences"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    if not isinstance(sentences, list):
+        return None
+    items = []
+    for item in sentences:
+        try:
+            english = str(item["english"]).strip()
+            translations = item.get("translations") or []
+        except (AttributeError, KeyError, TypeError):
+            continue
+        if isinstance(translations, str):
+            translations = [translations]
+        translations = [str(t).strip() for t in translations if str(t).strip()]
+        if english:
+            items.append((re.sub(r"^\d+[\).]\s*", "", english), translations))
+    return items
+
+
+def save(language, items):
+    """Store the translations of ``[(english, [translations])]`` that are not
+    stored yet."""
+    items = [(english, translations) for english, translations in items if translations]
+    if not items:
+        return
+    existing = set(
+        db.session.query(ReferenceTranslation.english_text, ReferenceTranslation.translation)
+        .filter(
+            ReferenceTranslation.language == language,
+            ReferenceTranslation.english_text.in_([english for english, _ in items]),
+        )
+        .all()
+    )
+    rows = []
+    for english, translations in items:
+        for translation in dict.fromkeys(translations):
+            if (english, translation) not in existing:
+                rows.append(
+                    ReferenceTranslation(
+                        language=language, english_text=english, translation=translation
+                    )
+                )
+    db.session.add_all(rows)
+    db.session.commit()
+
+
+def lookup(language, english):
+    return [
+        translation
+        for (translation,) in db.session.query(ReferenceTranslation.translation).filter(
+            ReferenceTranslation.language == language,
+            ReferenceTranslation.english_text == english.strip(),
+        )
+    ]
+
+
+def tokens(text):
+    """Normalized tokens with accents stripped: "Été" and "ete" compare equal."""
+    decomposed = unicodedata.normalize("NFKD", normalize(text))
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).split()
+
+
+def token_distance(a, b):
+    """Levenshtein distance between two token lists."""
+    previous = list(range(len(b) + 1))
+    for i, token_a in enumerate(a, 1):
+        current = [i]
+        for j, token_b in enumerate(b, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (token_a != token_b),
+                )
+            )
+        previous = current
+    return previous[-1]
+
+
+def similarity(translation, reference):
+    """1.0 for the same tokens, down to 0.0 for nothing in common."""
+    a, b = tokens(translation), tokens(reference)
+    if not a and not b:
+        return 1.0
+    return 1 - token_distance(a, b) / max(len(a), len(b))
+
+
+def grade_locally(language, english, translation):
+    """``(response_text, 1)`` when ``translation`` is at least
+    ``LOCAL_GRADING_MIN_SIMILARITY`` similar to a stored reference for
+    ``english``, else ``None`` to grade with the LLM. Outcomes are counted
+    in ``grading_local_total``."""
+    references = lookup(language, english)
+    if not references:
+        LOCAL_GRADES.inc(route=current_route(), outcome="no_reference")
+        return None
+    threshold = current_app.config.get("LOCAL_GRADING_MIN_SIMILARITY", 1.0)
+    best = max(similarity(translation, reference) for reference in references)
+    if tokens(translation) and best >= threshold:
+        LOCAL_GRADES.inc(route=current_route(), outcome="match")
+        return CORRECT_RESPONSE, 1
+    LOCAL_GRADES.inc(route=current_route(), outcome="escalated")
+    return None
@@ -0,0 +1,65 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+import sentence_pool
+
+
+class RefillScheduler:
+    """Tops sentence pools back up in the background.
+
+    A refill starts once a key drops below the low watermark and keeps
+    generating batches until the pool reaches the high watermark. Keys that
+    have not been requested within the idle window are left alone.
+    """
+
+    def __init__(self, max_workers=2):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="sentence-refill"
+        )
+        self._lock = threading.Lock()
+        self._inflight = set()
+        self._last_requested = {}
+
+    def touch(self, key):
+        with self._lock:
+            self._last_requested[key] = time.monotonic()
+
+    def is_active(self, key, idle_seconds):
+        with self._lock:
+            last = self._last_requested.get(key)
+        return last is not None and time.monotonic() - last <= idle_seconds
+
+    def maybe_refill(self, key, generate):
+        """Schedule ``generate`` for ``key`` if its pool is running low."""
+        app = current_app._get_current_object()
+        low = app.config.get("SENTENCE_POOL_LOW_WATERMARK", 3)
+        if sentence_pool.size(key) >= low:
+            return False
+        with self._lock:
+            if key in self._inflight:
+                return False
+            self._inflight.add(key)
+        self._executor.submit(self._refill, app, key, generate)
+        return True
+
+    def _refill(self, app, key, generate):
+        high = app.config.get("SENTENCE_POOL_HIGH_WATERMARK", 10)
+        idle_seconds = app.config.get("SENTENCE_POOL_IDLE_SECONDS", 600)
+        try:
+            with app.app_context():
+                while self.is_active(key, idle_seconds) and sentence_pool.size(key) < high:
+                    items = generate()
+                    if not items:
+                        break
+                    sentence_pool.fill(key, items)
+                    app.logger.info("Refilled %s with %d sentences", key, len(items))
+        except Exception:
+            app.logger.exception("Background refill failed for %s", key)
+        finally:
+            with self._lock:
+                self._inflight.discard(key)
+
+
+scheduler = RefillScheduler()
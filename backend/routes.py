@@ -1,14 +1,16 @@
-import os
-from flask import Blueprint, request, jsonify, send_file, current_app
-from openai import OpenAI
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 import csv
-from io import StringIO, BytesIO
+import json
+from io import StringIO
 import re
+import zlib
 import random
 from datetime import datetime
-from dotenv import load_dotenv
 from flask_cors import cross_origin
 from collections import defaultdict
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 
 from models import (
     db,
@@ -22,17 +24,37 @@ from models import (
     Instruction,
     VocabWord,
 )
+from llm import complete, complete_stream, fan_out, run_in_background
+from llm_cache import llm_cache
+from metrics import registry as metrics_registry
+from refdata import refdata
+from grading import grade, grade_batch, parse_verdict
+import sentence_pool
+import references
+from refill import scheduler as refill_scheduler
+from vocab_import import ingest_words, iter_uploaded_words
+import sync
+import srs
+import pagination
+from versions import conditional, catalog_scope, vocab_scope
 
 api_blueprint = Blueprint("api", __name__)
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-
-# cache of pre-generated sentences per (language, module, cefr)
-SENTENCE_BATCHES = {}
-# cache for vocab practice sentences per (user_id, language)
-VOCAB_BATCHES = {}
+def list_response(query, key_columns, serialize, descending=False):
+    """The whole list as a JSON array, or a keyset page wrapped as
+    ``{"items": [...], "next_cursor": ...}`` when the client sends ``limit``
+    or ``cursor``."""
+    try:
+        page = pagination.page_args()
+        if page is None:
+            rows = pagination.after(query, key_columns, None, descending).all()
+            return jsonify([serialize(r) for r in rows])
+        limit, values = page
+        rows, next_cursor = pagination.paginate(query, key_columns, limit, values, descending)
+    except ValueError:
+        return jsonify({"error": "invalid cursor"}), 400
+    return jsonify({"items": [serialize(r) for r in rows], "next_cursor": next_cursor})
 
 
 @api_blueprint.route("/users", methods=["GET", "POST", "OPTIONS"])
@@ -44,14 +66,87 @@ def users():
         db.session.add(user)
         db.session.commit()
         return jsonify({"id": user.id, "name": user.name})
-    users = User.query.all()
-    return jsonify([{"id": u.id, "name": u.name} for u in users])
+    return list_response(User.query, [User.id], lambda u: {"id": u.id, "name": u.name})
 
 
 @api_blueprint.route("/courses/<language>", methods=["GET"])
+@conditional(catalog_scope)
 def list_courses(language):
-    courses = Course.query.filter_by(language=language).all()
-    return jsonify([{"id": c.id, "name": c.name} for c in courses])
+    return list_response(
+        Course.query.filter_by(language=language),
+        [Course.id],
+        lambda c: {"id": c.id, "name": c.name},
+    )
+
+
+@api_blueprint.route("/courses/<language>/tree", methods=["GET"])
+@conditional(catalog_scope)
+def course_tree(language):
+    """Courses with their chapters and modules in one response.
+
+    ``depth`` is 1 (courses), 2 (+ chapters) or 3 (+ modules, the default)
+    and ``course_id`` limits the tree to one course. Every level is a single
+    query joined back to the course filter, so the query count stays fixed
+    however large the course is.
+    """
+    depth = min(max(request.args.get("depth", 3, type=int), 1), 3)
+    course_id = request.args.get("course_id", type=int)
+
+    course_query = Course.query.filter(Course.language == language)
+    if course_id is not None:
+        course_query = course_query.filter(Course.id == course_id)
+    courses = course_query.order_by(Course.id).all()
+    tree = [{"id": c.id, "name": c.name} for c in courses]
+    if depth < 2 or not courses:
+        return jsonify(tree)
+
+    course_ids = course_query.with_entities(Course.id)
+    chapters = (
+        db.session.query(Chapter.id, Chapter.course_id, Chapter.name)
+        .filter(Chapter.course_id.in_(course_ids))
+        .order_by(Chapter.id)
+        .all()
+    )
+    chapter_nodes = {}
+    chapters_by_course = defaultdict(list)
+    for ch in chapters:
+        node = {"id": ch.id, "name": ch.name}
+        chapter_nodes[ch.id] = node
+        chapters_by_course[ch.course_id].append(node)
+
+    if depth >= 3:
+        chapter_ids = (
+            db.session.query(Chapter.id)
+            .filter(Chapter.course_id.in_(course_ids))
+        )
+        modules = (
+            db.session.query(
+                Module.id,
+                Module.chapter_id,
+                Module.name,
+                Module.description,
+                Instruction.id.isnot(None).label("has_instruction"),
+            )
+            .outerjoin(Instruction, Instruction.module_id == Module.id)
+            .filter(Module.chapter_id.in_(chapter_ids))
+            .order_by(Module.id)
+            .all()
+        )
+        for node in chapter_nodes.values():
+            node["modules"] = []
+        for m in modules:
+            chapter_nodes[m.chapter_id]["modules"].append(
+                {
+                    "id": m.id,
+                    "name": m.name,
+                    "description": m.description or "",
+                    "has_instruction": bool(m.has_instruction),
+                }
+            )
+
+    for node in tree:
+        node["chapters"] = chapters_by_course[node["id"]]
+    return jsonify(tree)
 
 
 @api_blueprint.route("/courses", methods=["POST"])
@@ -81,6 +176,7 @@ def modify_course(course_id):
 
 
 @api_blueprint.route("/chapters/<int:course_id>", methods=["GET"])
+@conditional(catalog_scope)
 def list_chapters(course_id):
     chapters = Chapter.query.filter_by(course_id=course_id).all()
     return jsonify([{"id": ch.id, "name": ch.name} for ch in chapters])
@@ -113,6 +209,7 @@ def modify_chapter(chapter_id):
 
 
 @api_blueprint.route("/modules/by_chapter/<int:chapter_id>", methods=["GET"])
+@conditional(catalog_scope)
 def modules_by_chapter(chapter_id):
     modules = Module.query.filter_by(chapter_id=chapter_id).all()
     return jsonify(
@@ -124,12 +221,13 @@ def modules_by_chapter(chapter_id):
 
 
 @api_blueprint.route("/modules/<language>", methods=["GET"])
+@conditional(catalog_scope)
 def modules(language):
+    # names are unique per language, so the name alone is a stable key
     modules = Module.query.filter(
         Module.language == language, Module.name.isnot(None), Module.name != ''
-    ).all()
-    names = [m.name for m in modules]
-    return jsonify(names)
+    )
+    return list_response(modules, [Module.name], lambda m: m.name)
 
 
 @api_blueprint.route("/modules", methods=["POST"])
@@ -167,6 +265,20 @@ def modify_module(module_id):
     return jsonify({"id": module.id, "name": module.name})
 
 
+def instruction_prompt(module_name, language):
+    return f"Provide a short instructional module for an English speaker learning about {module_name} in {language}. Provide instruction in English."
+
+
+def save_instruction(module_id, text):
+    instr = Instruction.query.filter_by(module_id=module_id).first()
+    if instr:
+        instr.text = text
+    else:
+        instr = Instruction(module_id=module_id, text=text)
+        db.session.add(instr)
+    db.session.commit()
+
+
 @api_blueprint.route("/instruction", methods=["POST"])
 def instruction():
     data = request.json
@@ -177,35 +289,51 @@ def instruction():
     if not module_name:
         return jsonify({"error": "module required"}), 400
 
-    module = Module.query.filter_by(name=module_name, language=language).first()
-    if not module:
-        module = Module(name=module_name, language=language)
-        db.session.add(module)
-        db.session.commit()
+    module_id = refdata.module_id(module_name, language)
 
-    instr = Instruction.query.filter_by(module_id=module.id).first()
-    if instr and not force:
-        return jsonify({"instruction": instr.text})
+    existing = refdata.instruction_text(module_id)
+    if existing is not None and not force:
+        return jsonify({"instruction": existing})
 
-    prompt = f"Provide a short instructional module for an English speaker learning about {module_name} in {language}. Provide instruction in English."
-    current_app.logger.info("OpenAI prompt: %s", prompt)
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}],
-    )
-    current_app.logger.info(
-        "OpenAI response: %s", response.choices[0].message.content.strip()
-    )
-    text = response.choices[0].message.content.strip()
-    if instr:
-        instr.text = text
-    else:
-        instr = Instruction(module_id=module.id, text=text)
-        db.session.add(instr)
-    db.session.commit()
+    text = complete(instruction_prompt(module_name, language), cache="instruction")
+    save_instruction(module_id, text)
     return jsonify({"instruction": text})
 
 
+@api_blueprint.route("/instruction/stream", methods=["POST"])
+def instruction_stream():
+    """Same as /instruction, but streams the text as Server-Sent Events.
+
+    Emits ``token`` events as text arrives and a final ``done`` event with
+    the /instruction response body once the instruction has been saved.
+    """
+    data = request.json
+    module_name = data.get("module")
+    language = data.get("language")
+    force = data.get("force", False)
+    if not module_name:
+        return jsonify({"error": "module required"}), 400
+
+    module_id = refdata.module_id(module_name, language)
+    existing = refdata.instruction_text(module_id)
+
+    def events():
+        if existing is not None and not force:
+            yield sse_event("token", {"text": existing})
+            yield sse_event("done", {"instruction": existing})
+            return
+        parts = []
+        prompt = instruction_prompt(module_name, language)
+        for chunk in complete_stream(prompt, cache="instruction"):
+            parts.append(chunk)
+            yield sse_event("token", {"text": chunk})
+        text = "".join(parts).strip()
+        save_instruction(module_id, text)
+        yield sse_event("done", {"instruction": text})
+
+    return sse_response(events())
+
+
 def generate_batch_prompt(cefr, target_language, module, module_description=""):
     return (
         f"Generate 20 short English sentences for a student at the {cefr} level to translate into {target_language}. "
@@ -217,89 +345,62 @@ def generate_batch_prompt(cefr, target_language, module, module_description=""):
 
 def generate_sentence_batch(cefr, target_language, module, module_description=""):
     prompt = generate_batch_prompt(cefr, target_language, module, module_description)
-    current_app.logger.info("OpenAI prompt: %s", prompt)
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}],
-    )
-    current_app.logger.info(
-        "OpenAI response: %s", response.choices[0].message.content.strip()
-    )
-    text = response.choices[0].message.content.strip()
-    lines = [
-        re.sub(r"^\d+[\).]\s*", "", l).strip() for l in text.splitlines() if l.strip()
-    ]
-    unique_lines = list(dict.fromkeys(lines[1:-1])) # remove chatgpt filler
-    random.shuffle(unique_lines)
-    return unique_lines[:5]
+    items = references.generate(prompt, target_language)
+    if items is None:
+        text = complete(prompt)
+        lines = [
+            re.sub(r"^\d+[\).]\s*", "", l).strip() for l in text.splitlines() if l.strip()
+        ]
+        items = [(line, []) for line in lines[1:-1]] # remove chatgpt filler
+    items = list(dict(items).items())
+    random.shuffle(items)
+    references.save(target_language, items[:5])
+    return [english for english, _ in items[:5]]
 
 
 @api_blueprint.route("/sentence/preload", methods=["POST"])
 def preload_sentences():
     data = request.json
-    key = (data["language"], data["module"], data["cefr"])
+    key = sentence_pool.sentence_key(data["language"], data["module"], data["cefr"])
     sentences = generate_sentence_batch(
         data["cefr"],
         data["language"],
         data["module"],
         data.get("module_description", ""),
     )
-    SENTENCE_BATCHES[key] = sentences
+    sentence_pool.fill(key, sentences, replace=True)
     return jsonify({"count": len(sentences)})
 
 
 @api_blueprint.route("/sentence/generate", methods=["POST"])
 def generate_sentence():
     data = request.json
-    key = (data["language"], data["module"], data["cefr"])
-    batch = SENTENCE_BATCHES.get(key)
-    if not batch:
-        batch = generate_sentence_batch(
+    key = sentence_pool.sentence_key(data["language"], data["module"], data["cefr"])
+
+    def generate():
+        return generate_sentence_batch(
             data["cefr"],
             data["language"],
             data["module"],
             data.get("module_description", ""),
         )
-        SENTENCE_BATCHES[key] = batch
-    if not batch:
+
+    refill_scheduler.touch(key)
+    sentence = sentence_pool.claim(key)
+    if sentence is None:
+        sentence_pool.fill(key, generate())
+        sentence = sentence_pool.claim(key)
+    # personalized pools are built from the learner's topics in
+    # /personalized/preload, so only module pools are refilled here
+    if data["module"] != "personalized":
+        refill_scheduler.maybe_refill(key, generate)
+    if sentence is None:
         return jsonify({"sentence": ""})
-    sentence = batch.pop(0)
     return jsonify({"sentence": sentence})
 
 
-@api_blueprint.route("/sentence/submit", methods=["POST"])
-def submit_sentence():
-    data = request.json
-    user_id = data["user_id"]
-    module_name = data["module"]
-    language = data["language"]
-    cefr = data["cefr"]
-    english = data["english"]
-    translation = data["translation"]
-
-    module = Module.query.filter_by(name=module_name, language=language).first()
-    if not module:
-        module = Module(name=module_name, language=language)
-        db.session.add(module)
-        db.session.commit()
-
-    sentence = Sentence(
-        user_id=user_id,
-        module_id=module.id,
-        english_text=english,
-        user_translation=translation,
-        cefr_level=cefr,
-    )
-    db.session.add(sentence)
-    db.session.commit()
-
-    prompt_old = (
-        "Correct the translation in the following format. Focus on word and grammar issues. Do not add list of corrections for spelling mistakes:\n"
-        "<corrected sentence with only the corrections in **boldface**>\n"
-        "<list of corrections with explanations, newline delimited>"
-        ""
-        #"Ex. "
-    )
+def submission_prompts(module_name, language, english, translation):
+    """Return the correction prompt and the 1/0 judge prompt for a submission."""
     prompt = f"""
             Correct these, ignoring spelling errors.
             Respond in the format:
@@ -319,25 +420,6 @@ def submit_sentence():
 
     user_message = f"{english} - {translation}."
     full_prompt = prompt + "\n New submission \n" + user_message
-    current_app.logger.info("OpenAI prompt: %s", full_prompt)
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": full_prompt}],
-    )
-    current_app.logger.info(
-        "OpenAI response: %s", response.choices[0].message.content.strip()
-    )
-    text = response.choices[0].message.content.strip()
-    sentence.openai_response = text
-    db.session.commit()
-
-    # parse errors but do not save yet
-    lines = text.splitlines()
-    explanation_start = next(
-        (i for i, line in enumerate(lines) if line.strip().lower() == "explanation:"),
-        None,
-    )
-    explanation_lines = lines[explanation_start + 1 :] if explanation_start is not None else []
 
     # ask if translation is correct according to module topic
     judge_prompt = (
@@ -347,16 +429,86 @@ def submit_sentence():
         "Ignoring all mistakes outside of {module_name} (ex. ignoring spelling, prepositions, number agreement, and articles outside of the core module), did the learner correctly "
         "convey the meaning and use the module concept {module_name}? If the user gets a spelling mistake within the {module_name}, respond with 0. Respond only with 1 (for yes) or 0 (for no)."
     )
-    current_app.logger.info("OpenAI prompt: %s", judge_prompt)
-    judge_resp = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": judge_prompt}],
+    return full_prompt, judge_prompt
+
+
+def batch_submission_prompt(module_name, language, items):
+    """One correction prompt covering several ``(english, translation)`` pairs,
+    asking for the /sentence/submit correction and judge verdict of each."""
+    submissions = "\n".join(
+        f"{i}. {english} - {translation}."
+        for i, (english, translation) in enumerate(items, 1)
+    )
+    return f"""
+            Module topic: {module_name}.
+            Correct each of these numbered submissions, ignoring spelling errors.
+            Write each correction in the format:
+            <original {language} sentence>
+            <correct {language} sentence with only the corrections in bold>
+            Explanation:
+            <list of corrections with quick explanations, newline delimited>
+            If a submission is correct, simply write "No corrections needed"
+
+            Then mark each submission 1 or 0: ignoring all mistakes outside of {module_name} (ex. ignoring spelling, prepositions, number agreement, and articles outside of the core module), did the learner correctly convey the meaning and use the module concept {module_name}? If the learner makes a spelling mistake within {module_name}, mark it 0.
+
+            Submissions:
+            {submissions}
+            """
+
+
+def parse_explanation_lines(text):
+    lines = text.splitlines()
+    explanation_start = next(
+        (i for i, line in enumerate(lines) if line.strip().lower() == "explanation:"),
+        None,
+    )
+    return lines[explanation_start + 1 :] if explanation_start is not None else []
+
+
+def create_submission(data):
+    sentence = Sentence(
+        user_id=data["user_id"],
+        module_id=refdata.module_id(data["module"], data["language"]),
+        english_text=data["english"],
+        user_translation=data["translation"],
+        cefr_level=data["cefr"],
     )
-    current_app.logger.info(
-        "OpenAI response: %s", judge_resp.choices[0].message.content.strip()
+    db.session.add(sentence)
+    db.session.commit()
+    return sentence
+
+
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def sse_response(events):
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    correct_text = judge_resp.choices[0].message.content.strip()
-    correct_val = 1 if correct_text.startswith("1") else 0
+
+
+@api_blueprint.route("/sentence/submit", methods=["POST"])
+def submit_sentence():
+    data = request.json
+    sentence = create_submission(data)
+    graded = references.grade_locally(data["language"], data["english"], data["translation"])
+    if graded is not None:
+        text, correct_val = graded
+    else:
+        full_prompt, judge_prompt = submission_prompts(
+            data["module"], data["language"], data["english"], data["translation"]
+        )
+        # no translation for the judge rules: this judge also fails spelling
+        # mistakes within the module, which the correction ignores
+        text, correct_val = grade(full_prompt, judge_prompt)
+    sentence.openai_response = text
+    db.session.commit()
+
+    # parse errors but do not save yet
+    explanation_lines = parse_explanation_lines(text)
 
     return jsonify(
         {
@@ -368,6 +520,102 @@ def submit_sentence():
     )
 
 
+@api_blueprint.route("/sentence/submit/batch", methods=["POST"])
+def submit_sentence_batch():
+    """Grade several translations for one module at once.
+
+    Takes the /sentence/submit fields with an ``items`` list of
+    ``{"english", "translation"}`` objects instead of a single pair, and
+    returns ``{"results": [...]}`` holding one /sentence/submit response
+    body per item, in order.
+    """
+    data = request.json
+    items = [(item["english"], item["translation"]) for item in data.get("items") or []]
+    if not items:
+        return jsonify({"error": "items required"}), 400
+    module_name, language = data["module"], data["language"]
+
+    module_id = refdata.module_id(module_name, language)
+    sentences = [
+        Sentence(
+            user_id=data["user_id"],
+            module_id=module_id,
+            english_text=english,
+            user_translation=translation,
+            cefr_level=data["cefr"],
+        )
+        for english, translation in items
+    ]
+    db.session.add_all(sentences)
+    db.session.flush()
+    sentence_ids = [sentence.id for sentence in sentences]
+    db.session.commit()
+
+    def grade_one(item):
+        return grade(*submission_prompts(module_name, language, *item))
+
+    graded = grade_batch(
+        items,
+        lambda chunk: batch_submission_prompt(module_name, language, chunk),
+        grade_one,
+    )
+
+    results = []
+    for sentence_id, (text, correct_val) in zip(sentence_ids, graded):
+        results.append(
+            {
+                "response": text,
+                "correct": correct_val,
+                "errors": parse_explanation_lines(text),
+                "sentence_id": sentence_id,
+            }
+        )
+    # one executemany by primary key instead of reloading every sentence
+    db.session.execute(
+        update(Sentence),
+        [{"id": r["sentence_id"], "openai_response": r["response"]} for r in results],
+    )
+    db.session.commit()
+    return jsonify({"results": results})
+
+
+@api_blueprint.route("/sentence/submit/stream", methods=["POST"])
+def submit_sentence_stream():
+    """Same as /sentence/submit, but streams the correction as Server-Sent Events.
+
+    Emits ``token`` events while the correction is generated and one final
+    ``result`` event carrying the /sentence/submit response body.
+    """
+    data = request.json
+    sentence = create_submission(data)
+    full_prompt, judge_prompt = submission_prompts(
+        data["module"], data["language"], data["english"], data["translation"]
+    )
+    judge = run_in_background(complete, judge_prompt, cache="judge")
+    # the generator runs after this view returns, so reload by id there
+    sentence_id = sentence.id
+
+    def events():
+        parts = []
+        for chunk in complete_stream(full_prompt, cache="correction"):
+            parts.append(chunk)
+            yield sse_event("token", {"text": chunk})
+        text = "".join(parts).strip()
+        db.session.get(Sentence, sentence_id).openai_response = text
+        db.session.commit()
+        yield sse_event(
+            "result",
+            {
+                "response": text,
+                "correct": parse_verdict(judge.result()),
+                "errors": parse_explanation_lines(text),
+                "sentence_id": sentence_id,
+            },
+        )
+
+    return sse_response(events())
+
+
 @api_blueprint.route("/errors/save", methods=["POST"])
 def save_errors():
     data = request.json
@@ -378,6 +626,7 @@ def save_errors():
         return jsonify({"error": "Sentence not found"}), 404
     for line in errors:
         err = Error(sentence_id=sentence.id, 
+            user_id=sentence.user_id,
             error_text=line, 
             module_id=sentence.module_id,
             last_reviewed=None,
@@ -390,30 +639,64 @@ def save_errors():
     return jsonify({"status": "ok", "count": len(errors)})
 
 
+EXPORT_CHUNK_SIZE = 500
+
+
+def csv_response(filename, header, rows):
+    """Stream ``rows`` as a CSV attachment, gzipped if the client accepts it.
+
+    Rows are written into a small buffer that is flushed every few KB, so
+    memory stays flat no matter how many rows the query yields.
+    """
+    use_gzip = request.accept_encodings["gzip"] > 0
+
+    def generate():
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        compressor = zlib.compressobj(wbits=31) if use_gzip else None
+
+        def flush():
+            data = buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            return compressor.compress(data) if compressor else data
+
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() >= 16384:
+                chunk = flush()
+                if chunk:
+                    yield chunk
+        chunk = flush()
+        if compressor:
+            chunk += compressor.flush()
+        if chunk:
+            yield chunk
+
+    headers = {
+        "Content-Disposition": f"attachment; filename={filename}",
+        "Vary": "Accept-Encoding",
+    }
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+    return Response(
+        stream_with_context(generate()), mimetype="text/csv", headers=headers
+    )
+
+
 @api_blueprint.route("/session/<int:user_id>/export", methods=["GET"])
 def export_session(user_id):
-    sentences = Sentence.query.filter_by(user_id=user_id).all()
-
-    # Write CSV to string
-    string_data = StringIO()
-    writer = csv.writer(string_data)
-    writer.writerow(
-        [
-            "timestamp",
-            "english",
-            "submitted",
-            "corrected",
-            "explanation",
-            "module",
-            "language",
-            "cefr",
-        ]
-    )
-    for s in sentences:
-        explanation = s.openai_response.replace("\n", " ")
-        corrected = s.openai_response.split('.')[1] if (s.openai_response and len(s.openai_response.split('.')) > 1) else ""
-        writer.writerow(
-            [
+    def rows():
+        sentences = pagination.iter_keyset(
+            Sentence.query.options(joinedload(Sentence.module)).filter_by(user_id=user_id),
+            [Sentence.timestamp, Sentence.id],
+            EXPORT_CHUNK_SIZE,
+        )
+        for s in sentences:
+            explanation = s.openai_response.replace("\n", " ")
+            corrected = s.openai_response.split('.')[1] if (s.openai_response and len(s.openai_response.split('.')) > 1) else ""
+            yield [
                 s.timestamp,
                 s.english_text,
                 s.user_translation,
@@ -423,49 +706,38 @@ def export_session(user_id):
                 s.module.language,
                 s.cefr_level,
             ]
-        )
-    string_data.seek(0)
 
-    # Convert to binary for send_file
-    bytes_data = BytesIO(string_data.getvalue().encode("utf-8"))
-
-    return send_file(
-        bytes_data,
-        mimetype="text/csv",
-        as_attachment=True,
-        download_name="session.csv",
+    return csv_response(
+        "session.csv",
+        [
+            "timestamp",
+            "english",
+            "submitted",
+            "corrected",
+            "explanation",
+            "module",
+            "language",
+            "cefr",
+        ],
+        rows(),
     )
 
 
 @api_blueprint.route("/session/<int:user_id>/errors", methods=["GET"])
 def export_errors(user_id):
-    errors = (
-        db.session.query(Error, Sentence.timestamp, Module.name)
-        .join(Sentence, Error.sentence_id == Sentence.id)
-        .join(Module, Error.module_id == Module.id)
-        .filter(Sentence.user_id == user_id)
-        .all()
-    )
-
-    string_data = StringIO()
-    writer = csv.writer(string_data)
-    writer.writerow([
-        "timestamp",
-        "module",
-        "error_text",
-    ])
-    for err, ts, module_name in errors:
-        writer.writerow([ts, module_name, err.error_text])
-    string_data.seek(0)
+    def rows():
+        errors = pagination.iter_keyset(
+            db.session.query(Error.id, Error.error_text, Sentence.timestamp, Module.name)
+            .join(Sentence, Error.sentence_id == Sentence.id)
+            .join(Module, Error.module_id == Module.id)
+            .filter(Sentence.user_id == user_id),
+            [Error.id],
+            EXPORT_CHUNK_SIZE,
+        )
+        for _, error_text, ts, module_name in errors:
+            yield [ts, module_name, error_text]
 
-    bytes_data = BytesIO(string_data.getvalue().encode("utf-8"))
-
-    return send_file(
-        bytes_data,
-        mimetype="text/csv",
-        as_attachment=True,
-        download_name="errors.csv",
-    )
+    return csv_response("errors.csv", ["timestamp", "module", "error_text"], rows())
 
 @api_blueprint.route("/personalized/preload", methods=["POST"])
 def personalized_preload():
@@ -477,19 +749,16 @@ def personalized_preload():
         f"Generate 20 short English sentences for a student at the {cefr} level to translate into {language}. "
         f"The sentences should help practice the following topics: {', '.join(topics)}. Number each sentence."
     )
-    current_app.logger.info("OpenAI prompt: %s", prompt)
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}],
-    )
-    current_app.logger.info(
-        "OpenAI response: %s", response.choices[0].message.content.strip()
-    )
-    lines = [re.sub(r"^\d+[\).]\s*", "", l).strip() for l in response.choices[0].message.content.strip().splitlines() if l.strip()]
-    random.shuffle(lines)
-    key = (language, "personalized", cefr)
-    SENTENCE_BATCHES[key] = lines[:20]
-    return jsonify({"count": len(SENTENCE_BATCHES[key])})
+    items = references.generate(prompt, language)
+    if items is None:
+        text = complete(prompt)
+        lines = [re.sub(r"^\d+[\).]\s*", "", l).strip() for l in text.splitlines() if l.strip()]
+        items = [(line, []) for line in lines]
+    random.shuffle(items)
+    references.save(language, items[:20])
+    key = sentence_pool.sentence_key(language, "personalized", cefr)
+    count = sentence_pool.fill(key, [english for english, _ in items[:20]], replace=True)
+    return jsonify({"count": count})
 
 
 @api_blueprint.route("/session/complete", methods=["POST"])
@@ -501,11 +770,7 @@ def session_complete():
     questions_answered = data.get("questions_answered", 0)
     questions_correct = data.get("questions_correct", 0)
 
-    module = Module.query.filter_by(name=module_name, language=language).first()
-    if not module:
-        module = Module(name=module_name, language=language)
-        db.session.add(module)
-        db.session.commit()
+    module_id = refdata.module_id(module_name, language)
 
     score = (
         questions_correct / questions_answered
@@ -515,7 +780,7 @@ def session_complete():
 
     result = ModuleResult(
         user_id=user_id,
-        module_id=module.id,
+        module_id=module_id,
         questions_answered=questions_answered,
         questions_correct=questions_correct,
         score=score,
@@ -525,67 +790,108 @@ def session_complete():
     return jsonify({"status": "ok"})
 
 
+@api_blueprint.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(metrics_registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+@api_blueprint.route("/llm/cache/stats", methods=["GET"])
+def llm_cache_stats():
+    return jsonify(llm_cache.stats())
+
+
 @api_blueprint.route("/results/<int:user_id>/<language>", methods=["GET"])
 def module_results(user_id, language):
+    # rank each module's results newest first and keep the top three in SQL,
+    # so the cost follows the number of modules rather than sessions played
+    ranked = (
+        db.session.query(
+            ModuleResult.module_id,
+            ModuleResult.timestamp,
+            ModuleResult.score,
+            func.row_number()
+            .over(
+                partition_by=ModuleResult.module_id,
+                order_by=(ModuleResult.timestamp.desc(), ModuleResult.id.desc()),
+            )
+            .label("rank"),
+        )
+        .filter(ModuleResult.user_id == user_id)
+        .subquery()
+    )
     rows = (
-        db.session.query(ModuleResult, Module.name)
-        .join(Module, ModuleResult.module_id == Module.id)
-        .filter(ModuleResult.user_id == user_id, Module.language == language)
-        .order_by(ModuleResult.timestamp.desc())
+        db.session.query(Module.name, ranked.c.timestamp, ranked.c.score)
+        .join(ranked, ranked.c.module_id == Module.id)
+        .filter(Module.language == language, ranked.c.rank <= 3)
+        .order_by(ranked.c.module_id, ranked.c.rank)
         .all()
     )
     data = defaultdict(lambda: {"scores": [], "last_reviewed": None})
 
-    for res, name in rows:
+    for name, timestamp, score in rows:
         entry = data[name]
         if entry["last_reviewed"] is None:
-            entry["last_reviewed"] = res.timestamp.isoformat()
-        if len(entry["scores"]) < 3:
-            entry["scores"].append(res.score)
+            entry["last_reviewed"] = timestamp.isoformat()
+        entry["scores"].append(score)
 
     return jsonify({k: v for k, v in data.items()})
 
 
 
+def error_to_dict(err):
+    return {
+        "id": err.id,
+        "error_text": err.error_text,
+        "last_reviewed": err.last_reviewed.isoformat()
+        if err.last_reviewed
+        else None,
+        "last_reviewed_correctly": err.last_reviewed_correctly.isoformat()
+        if err.last_reviewed_correctly
+        else None,
+        "review_count": err.review_count,
+        "correct_review_count": err.correct_review_count,
+    }
+
+
 @api_blueprint.route("/personalized/errors", methods=["POST"])
 def personalized_errors():
     data = request.json
     user_id = data.get("user_id")
     language = data.get("language")
 
-    rows = (
-        db.session.query(Error, Sentence.timestamp)
-        .join(Sentence, Error.sentence_id == Sentence.id)
-        .join(Module, Error.module_id == Module.id)
-        .filter(Sentence.user_id == user_id, Module.language == language)
-        .order_by(
-            Error.last_reviewed_correctly.desc().nullsfirst(),
-            Sentence.timestamp.desc(),
-        )
+    # next 20 due, read in order off ix_error_user_id_next_due
+    errors = (
+        Error.query.join(Module, Error.module_id == Module.id)
+        .filter(Error.user_id == user_id, Module.language == language)
+        .order_by(Error.next_due, Error.id)
         .limit(20)
         .all()
     )
 
-    data_list = []
-    for err, ts in rows:
-        data_list.append(
-            {
-                "id": err.id,
-                "error_text": err.error_text,
-                "last_reviewed": err.last_reviewed.isoformat()
-                if err.last_reviewed
-                else None,
-                "last_reviewed_correctly": err.last_reviewed_correctly.isoformat()
-                if err.last_reviewed_correctly
-                else None,
-                "review_count": err.review_count,
-                "correct_review_count": err.correct_review_count,
-            }
-        )
+    data_list = [error_to_dict(err) for err in errors]
 
     return jsonify({"errors": data_list})
 
 
+@api_blueprint.route("/personalized/errors/changes", methods=["GET"])
+def personalized_errors_changes():
+    """Errors changed or deleted since the ``since`` cursor, see vocab_changes."""
+    user_id = request.args.get("user_id", type=int)
+    language = request.args.get("language")
+    if not user_id or not language:
+        return jsonify({"error": "user_id and language required"}), 400
+    since = request.args.get("since", 0, type=int)
+    changed, deleted, cursor, has_more = sync.error_changes(user_id, language, since)
+    return jsonify(
+        {
+            "changes": [error_to_dict(err) for err in changed],
+            "deleted": deleted,
+            "cursor": cursor,
+            "has_more": has_more,
+        }
+    )
+
+
 @api_blueprint.route("/personalized/error_sentence", methods=["POST"])
 def personalized_error_sentence():
     data = request.json
@@ -597,21 +903,17 @@ def personalized_error_sentence():
     if not err:
         return jsonify({"sentence": ""})
 
-    module_name = err.module.name
+    key = sentence_pool.error_key(err.id)
+    sentence = sentence_pool.claim(key)
+    if sentence is not None:
+        return jsonify({"sentence": sentence})
+
     prompt = (
         f"Generate 10 short English sentences for a student at the B2 level to translate into {language}. "
         f"Focus on the following error: {err.error_text}. Number each sentence."
     )
-    current_app.logger.info("OpenAI prompt: %s", prompt)
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}],
-    )
-    current_app.logger.info(
-        "OpenAI response: %s", response.choices[0].message.content.strip()
-    )
+    raw_text = complete(prompt)
     pattern = re.compile(r"^\s*\d+[\).:\-]?\s+")
-    raw_text = response.choices[0].message.content.strip()
     lines = [
         re.sub(pattern, "", line).strip()
         for line in raw_text.splitlines()
@@ -619,8 +921,9 @@ def personalized_error_sentence():
     ]
     if not lines:
         return jsonify({"sentence": ""})
-    sentence = random.choice(lines)
-    return jsonify({"sentence": sentence})
+    random.shuffle(lines)
+    sentence_pool.fill(key, lines[1:])
+    return jsonify({"sentence": lines[0]})
 
 
 @api_blueprint.route("/personalized/error_submit", methods=["POST"])
@@ -648,15 +951,6 @@ def personalized_error_submit():
 
     user_message = f"{english} - {translation}."
     full_prompt = prompt + "\n New submission \n" + user_message
-    current_app.logger.info("OpenAI prompt: %s", full_prompt)
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": full_prompt}],
-    )
-    current_app.logger.info(
-        "OpenAI response: %s", response.choices[0].message.content.strip()
-    )
-    text = response.choices[0].message.content.strip()
 
     judge_prompt = (
         f"Error to practice: {err.error_text}.\n"
@@ -664,22 +958,14 @@ def personalized_error_submit():
         f"Learner translation: {translation}\n"
         "Ignoring spelling or vocabulary mistakes, did the learner demonstrate understanding of the error? Respond only with 1 or 0."
     )
-    current_app.logger.info("OpenAI prompt: %s", judge_prompt)
-    judge_resp = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": judge_prompt}],
-    )
-    current_app.logger.info(
-        "OpenAI response: %s", judge_resp.choices[0].message.content.strip()
-    )
-    correct_text = judge_resp.choices[0].message.content.strip()
-    correct_val = 1 if correct_text.startswith("1") else 0
+    text, correct_val = grade(full_prompt, judge_prompt, translation=translation)
 
     err.last_reviewed = datetime.utcnow()
     err.review_count = (err.review_count or 0) + 1
     if correct_val == 1:
         err.last_reviewed_correctly = datetime.utcnow()
         err.correct_review_count = (err.correct_review_count or 0) + 1
+    srs.schedule(err, correct_val == 1)
     db.session.commit()
 
     return jsonify({"response": text, "correct": correct_val})
@@ -696,38 +982,79 @@ def add_vocab():
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    added = 0
-    for w in words:
-        word = w.strip()
-        if not word:
-            continue
-        exists = VocabWord.query.filter_by(user_id=user_id, language=language, word=word).first()
-        if exists:
-            continue
-        vw = VocabWord(user_id=user_id, language=language, word=word)
-        db.session.add(vw)
-        added += 1
-    db.session.commit()
-    return jsonify({"status": "ok", "count": added})
+    inserted, skipped = ingest_words(user_id, language, words)
+    return jsonify({"status": "ok", "count": inserted, "inserted": inserted, "skipped": skipped})
+
+
+@api_blueprint.route("/vocab/import", methods=["POST"])
+def import_vocab():
+    """Bulk-add vocab from an uploaded file.
+
+    Accepts a multipart ``file`` field (``.csv`` uses the first column,
+    anything else one word per line) or a raw ``text/plain``/``text/csv``
+    body. ``user_id`` and ``language`` come from form or query parameters.
+    """
+    user_id = request.values.get("user_id", type=int)
+    language = request.values.get("language")
+    if not user_id or not language:
+        return jsonify({"error": "user_id and language required"}), 400
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+
+    upload = request.files.get("file")
+    if upload is not None:
+        words = iter_uploaded_words(upload.stream, upload.filename or "")
+    else:
+        filename = "upload.csv" if request.mimetype == "text/csv" else "upload.txt"
+        words = iter_uploaded_words(request.stream, filename)
+
+    inserted, skipped = ingest_words(user_id, language, words)
+    return jsonify({"status": "ok", "inserted": inserted, "skipped": skipped})
+
+
+def vocab_to_dict(w):
+    return {
+        "id": w.id,
+        "word": w.word,
+        "language": w.language,
+        "added_at": w.added_at.isoformat() if w.added_at else None,
+        "last_reviewed": w.last_reviewed.isoformat() if w.last_reviewed else None,
+        "last_correct": w.last_correct.isoformat() if w.last_correct else None,
+        "review_count": w.review_count,
+        "correct_count": w.correct_count,
+    }
 
 
 @api_blueprint.route("/vocab/<int:user_id>/<language>", methods=["GET"])
+@conditional(vocab_scope)
 def list_vocab(user_id, language):
-    """List all vocab words for a user and language."""
-    words = VocabWord.query.filter_by(user_id=user_id, language=language).order_by(VocabWord.added_at.desc()).all()
-    return jsonify([
+    """List vocab words for a user and language, newest first."""
+    return list_response(
+        VocabWord.query.filter_by(user_id=user_id, language=language),
+        [VocabWord.added_at, VocabWord.id],
+        vocab_to_dict,
+        descending=True,
+    )
+
+
+@api_blueprint.route("/vocab/<int:user_id>/<language>/changes", methods=["GET"])
+def vocab_changes(user_id, language):
+    """Vocab words changed or deleted since the ``since`` cursor.
+
+    Start with ``since=0`` and pass the returned ``cursor`` back on the next
+    call; keep calling while ``has_more`` is true.
+    """
+    since = request.args.get("since", 0, type=int)
+    changed, deleted, cursor, has_more = sync.vocab_changes(user_id, language, since)
+    return jsonify(
         {
-            "id": w.id,
-            "word": w.word,
-            "language": w.language,
-            "added_at": w.added_at.isoformat() if w.added_at else None,
-            "last_reviewed": w.last_reviewed.isoformat() if w.last_reviewed else None,
-            "last_correct": w.last_correct.isoformat() if w.last_correct else None,
-            "review_count": w.review_count,
-            "correct_count": w.correct_count,
+            "changes": [vocab_to_dict(w) for w in changed],
+            "deleted": deleted,
+            "cursor": cursor,
+            "has_more": has_more,
         }
-        for w in words
-    ])
+    )
 
 
 @api_blueprint.route("/vocab/<int:word_id>", methods=["PUT"])
@@ -739,7 +1066,11 @@ def update_vocab(word_id):
     if not new_word:
         return jsonify({"error": "word is required"}), 400
     vw.word = new_word
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "word already exists"}), 409
     return jsonify({"id": vw.id, "word": vw.word})
 
 
@@ -754,37 +1085,35 @@ def delete_vocab(word_id):
 
 @api_blueprint.route("/vocab/<int:user_id>/export", methods=["GET"])
 def export_vocab(user_id):
-    words = VocabWord.query.filter_by(user_id=user_id).order_by(VocabWord.added_at).all()
-
-    string_data = StringIO()
-    writer = csv.writer(string_data)
-    writer.writerow([
-        "word",
-        "language",
-        "added_at",
-        "last_reviewed",
-        "last_correct",
-        "review_count",
-        "correct_count",
-    ])
-    for w in words:
-        writer.writerow([
-            w.word,
-            w.language,
-            w.added_at,
-            w.last_reviewed or "",
-            w.last_correct or "",
-            w.review_count,
-            w.correct_count,
-        ])
-    string_data.seek(0)
-    bytes_data = BytesIO(string_data.getvalue().encode("utf-8"))
-
-    return send_file(
-        bytes_data,
-        mimetype="text/csv",
-        as_attachment=True,
-        download_name="vocab.csv",
+    def rows():
+        words = pagination.iter_keyset(
+            VocabWord.query.filter_by(user_id=user_id),
+            [VocabWord.id],
+            EXPORT_CHUNK_SIZE,
+        )
+        for w in words:
+            yield [
+                w.word,
+                w.language,
+                w.added_at,
+                w.last_reviewed or "",
+                w.last_correct or "",
+                w.review_count,
+                w.correct_count,
+            ]
+
+    return csv_response(
+        "vocab.csv",
+        [
+            "word",
+            "language",
+            "added_at",
+            "last_reviewed",
+            "last_correct",
+            "review_count",
+            "correct_count",
+        ],
+        rows(),
     )
 
 
@@ -798,37 +1127,34 @@ def vocab_preload():
 
     words = (
         VocabWord.query.filter_by(user_id=user_id, language=language)
-        .order_by(VocabWord.last_correct.asc().nullsfirst())
+        .order_by(VocabWord.next_due, VocabWord.id)
         .limit(count)
         .all()
     )
 
-    batch = []
-    for w in words:
+    def sentence_for(w):
         prompt = (
             f"Generate 5 short English sentences for a student at the {cefr} level to translate into {language}. "
             f"The translation of each sentence must include the word '{w.word}' in a different syntactic structure (e.g., declarative, interrogative, imperative, conditional) and in a different real-life context. "
             f"Number each sentence."
         )
-        current_app.logger.info("OpenAI prompt: %s", prompt)
-        resp = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
-        )
-        current_app.logger.info(
-            "OpenAI response: %s", resp.choices[0].message.content.strip()
-        )
+        text = complete(prompt)
         lines = [
             re.sub(r"^\d+[\).]\s*", "", l).strip()
-            for l in resp.choices[0].message.content.strip().splitlines()
+            for l in text.splitlines()
             if l.strip() and re.match(r"^\d+[\).]\s*", l)
         ]
         if not lines:
+            return None
+        return random.choice(lines)
+
+    batch = []
+    for w, sentence in zip(words, fan_out(sentence_for, words)):
+        if not sentence:
             continue
-        sentence = random.choice(lines)
         batch.append({"id": w.id, "word": w.word, "sentence": sentence})
 
-    VOCAB_BATCHES[(user_id, language)] = batch
+    sentence_pool.fill(sentence_pool.vocab_key(user_id, language), batch, replace=True)
     return jsonify({"count": len(batch)})
 
 
@@ -837,11 +1163,9 @@ def vocab_generate():
     data = request.json
     user_id = data.get("user_id")
     language = data.get("language")
-    key = (user_id, language)
-    batch = VOCAB_BATCHES.get(key)
-    if not batch:
+    item = sentence_pool.claim(sentence_pool.vocab_key(user_id, language))
+    if item is None:
         return jsonify({"sentence": "", "word": "", "word_id": None})
-    item = batch.pop(0)
     return jsonify({"sentence": item["sentence"], "word": item["word"], "word_id": item["id"]})
 
 
@@ -870,22 +1194,6 @@ def vocab_submit():
 
     user_message = f"{english} - {translation}."
     full_prompt = prompt + "\n New submission \n" + user_message
-    current_app.logger.info("OpenAI prompt: %s", full_prompt)
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": full_prompt}],
-    )
-    current_app.logger.info(
-        "OpenAI response: %s", response.choices[0].message.content.strip()
-    )
-    text = response.choices[0].message.content.strip()
-
-    lines = text.splitlines()
-    explanation_start = next(
-        (i for i, line in enumerate(lines) if line.strip().lower() == "explanation:"),
-        None,
-    )
-    explanation_lines = lines[explanation_start + 1 :] if explanation_start is not None else []
 
     judge_prompt = (
         f"Vocabulary word: {vw.word}.\n"
@@ -893,25 +1201,21 @@ def vocab_submit():
         f"Learner translation: {translation}\n"
         f"Did the learner correctly convey the meaning and use the word {vw.word}? Respond only with 1 or 0."
     )
-    current_app.logger.info("OpenAI prompt: %s", judge_prompt)
-    judge_resp = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": judge_prompt}],
-    )
-    current_app.logger.info(
-        "OpenAI response: %s", judge_resp.choices[0].message.content.strip()
+    text, correct_val = grade(
+        full_prompt, judge_prompt, translation=translation, required_word=vw.word
     )
-    correct_text = judge_resp.choices[0].message.content.strip()
-    correct_val = 1 if correct_text.startswith("1") else 0
+    explanation_lines = parse_explanation_lines(text)
 
     prev_last_correct = vw.last_correct
     prev_correct_count = vw.correct_count or 0
+    prev_schedule = srs.snapshot(vw)
 
     vw.last_reviewed = datetime.utcnow()
     vw.review_count = (vw.review_count or 0) + 1
     if correct_val == 1:
         vw.last_correct = datetime.utcnow()
         vw.correct_count = (vw.correct_count or 0) + 1
+    srs.schedule(vw, correct_val == 1)
     db.session.commit()
 
     return jsonify({
@@ -920,6 +1224,7 @@ def vocab_submit():
         "errors": explanation_lines,
         "prev_last_correct": prev_last_correct.isoformat() if prev_last_correct else None,
         "prev_correct_count": prev_correct_count,
+        "prev_schedule": prev_schedule,
     })
 
 
@@ -943,5 +1248,13 @@ def vocab_override():
         vw.last_correct = datetime.fromisoformat(prev_last_correct) if prev_last_correct else None
         vw.correct_count = prev_correct_count
 
+    if new_correct != initial_correct:
+        # reschedule from the state before the overridden verdict when the
+        # client sends it back, otherwise from the current state
+        prev_schedule = data.get("prev_schedule")
+        if prev_schedule:
+            srs.restore(vw, prev_schedule)
+        srs.schedule(vw, new_correct == 1)
+
     db.session.commit()
     return jsonify({"status": "ok"})
@@ -0,0 +1,59 @@
+import json
+from sqlalchemy import delete, func
+
+from models import db, PooledSentence
+
+
+def sentence_key(language, module, cefr):
+    return f"sentence:{language}:{module}:{cefr}"
+
+
+def vocab_key(user_id, language):
+    return f"vocab:{user_id}:{language}"
+
+
+def error_key(error_id):
+    return f"error:{error_id}"
+
+
+def fill(key, items, replace=False):
+    """Add ``items`` (any JSON-serialisable values) to the pool for ``key``."""
+    if replace:
+        db.session.execute(delete(PooledSentence).where(PooledSentence.pool_key == key))
+    db.session.add_all(
+        PooledSentence(pool_key=key, payload=json.dumps(item)) for item in items
+    )
+    db.session.commit()
+    return len(items)
+
+
+def size(key):
+    return (
+        db.session.query(func.count(PooledSentence.id))
+        .filter(PooledSentence.pool_key == key)
+        .scalar()
+    )
+
+
+def claim(key):
+    """Remove and return the oldest item for ``key``, or ``None`` if empty.
+
+    The row is only ours if our DELETE removed it, so two workers racing for
+    the same row cannot both serve it; the loser simply tries the next one.
+    """
+    while True:
+        row = (
+            db.session.query(PooledSentence.id, PooledSentence.payload)
+            .filter(PooledSentence.pool_key == key)
+            .order_by(PooledSentence.id)
+            .first()
+        )
+        if row is None:
+            db.session.commit()
+            return None
+        result = db.session.execute(
+            delete(PooledSentence).where(PooledSentence.id == row.id)
+        )
+        db.session.commit()
+        if result.rowcount == 1:
+            return json.loads(row.payload)
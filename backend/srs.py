@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+# how soon a missed item comes back
+RETRY_DELAY = timedelta(minutes=10)
+
+
+def snapshot(item):
+    """The scheduling fields of ``item`` in a JSON-friendly form, so a verdict
+    can be undone later with :func:`restore`."""
+    return {
+        "ease": item.ease,
+        "interval_days": item.interval_days,
+        "next_due": item.next_due.isoformat() if item.next_due else None,
+    }
+
+
+def restore(item, state):
+    item.ease = state.get("ease")
+    item.interval_days = state.get("interval_days")
+    next_due = state.get("next_due")
+    item.next_due = datetime.fromisoformat(next_due) if next_due else None
+
+
+def schedule(item, correct, now=None):
+    """Update ``ease``, ``interval_days`` and ``next_due`` after a review.
+
+    A simplified SM-2: a correct answer moves the interval from 0 to 1 to 6
+    days and then multiplies it by the ease factor; a miss lowers the ease
+    and brings the item back after a short delay.
+    """
+    now = now or datetime.utcnow()
+    ease = item.ease or DEFAULT_EASE
+    interval = item.interval_days or 0
+    if correct:
+        if interval < 1:
+            interval = 1
+        elif interval < 6:
+            interval = 6
+        else:
+            interval = round(interval * ease, 2)
+        item.next_due = now + timedelta(days=interval)
+    else:
+        ease = max(MIN_EASE, ease - 0.2)
+        interval = 0
+        item.next_due = now + RETRY_DELAY
+    item.ease = ease
+    item.interval_days = interval
@@ -0,0 +1,51 @@
+"""Summarize the cProfile dumps written by the profiling middleware.
+
+Usage:
+    python summarize_profiles.py [DUMP_DIR] [--route api.submit_sentence]
+                                 [--sort cumulative] [--limit 25]
+
+Dumps for the same route are merged, so the output shows where that route
+spent its Python time across every sampled request.
+"""
+import argparse
+import os
+import pstats
+
+
+def route_dumps(dump_dir, route=None):
+    """``{route: [dump paths]}`` for every route directory under ``dump_dir``."""
+    routes = {}
+    for name in sorted(os.listdir(dump_dir)):
+        directory = os.path.join(dump_dir, name)
+        if not os.path.isdir(directory) or (route and name != route):
+            continue
+        paths = sorted(
+            os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".prof")
+        )
+        if paths:
+            routes[name] = paths
+    return routes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("dump_dir", nargs="?", default=os.getenv("PROFILING_DUMP_DIR", "profiles"))
+    parser.add_argument("--route", help="only this endpoint, e.g. api.submit_sentence")
+    parser.add_argument("--sort", default="cumulative", help="pstats sort key")
+    parser.add_argument("--limit", type=int, default=25, help="functions to show per route")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dump_dir):
+        parser.error(f"no such directory: {args.dump_dir}")
+    routes = route_dumps(args.dump_dir, args.route)
+    if not routes:
+        parser.error(f"no profile dumps in {args.dump_dir}")
+
+    for route, paths in routes.items():
+        print(f"== {route} ({len(paths)} requests)")
+        stats = pstats.Stats(*paths)
+        stats.strip_dirs().sort_stats(args.sort).print_stats(args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+from sqlalchemy import event, select, update, insert, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import Error, Module, Sentence, SyncCounter, SyncTombstone, VocabWord
+
+
+SYNC_PAGE_SIZE = 500
+
+
+def next_value(connection, name, n=1):
+    """Atomically add ``n`` to counter ``name`` and return its new value.
+
+    The counter row stays locked until the surrounding transaction ends, so
+    values handed out for one counter follow commit order.
+    """
+    table = SyncCounter.__table__
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = (
+            dialect_insert(table)
+            .values(name=name, value=n)
+            .on_conflict_do_update(
+                index_elements=[table.c.name], set_={"value": table.c.value + n}
+            )
+            .returning(table.c.value)
+        )
+        return connection.execute(stmt).scalar_one()
+
+    updated = connection.execute(
+        update(table).where(table.c.name == name).values(value=table.c.value + n)
+    ).rowcount
+    if not updated:
+        connection.execute(insert(table).values(name=name, value=n))
+    return connection.execute(select(table.c.value).where(table.c.name == name)).scalar_one()
+
+
+def sync_counter_name(user_id):
+    return f"sync:{user_id}"
+
+
+def allocate_sync_seqs(connection, user_id, n):
+    """Reserve ``n`` consecutive sync sequence numbers for a user."""
+    last = next_value(connection, sync_counter_name(user_id), n)
+    return range(last - n + 1, last + 1)
+
+
+def _error_user_id(session, err):
+    if err.user_id is None and err.sentence_id is not None:
+        sentence = session.get(Sentence, err.sentence_id)
+        err.user_id = sentence.user_id if sentence else None
+    return err.user_id
+
+
+@event.listens_for(Session, "before_flush")
+def _stamp_sync_seq(session, flush_context, instances):
+    """Give every new or changed VocabWord/Error the user's next sync_seq and
+    leave a tombstone for every deleted one."""
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, VocabWord):
+            user_id = obj.user_id
+        elif isinstance(obj, Error):
+            user_id = _error_user_id(session, obj)
+        else:
+            continue
+        if user_id is None or (obj in session.dirty and not session.is_modified(obj)):
+            continue
+        obj.sync_seq = next_value(session.connection(), sync_counter_name(user_id))
+
+    for obj in list(session.deleted):
+        if isinstance(obj, VocabWord):
+            entity, user_id, language = "vocab", obj.user_id, obj.language
+        elif isinstance(obj, Error):
+            entity, user_id, language = "error", _error_user_id(session, obj), None
+        else:
+            continue
+        if user_id is None:
+            continue
+        session.add(
+            SyncTombstone(
+                entity=entity,
+                entity_id=obj.id,
+                user_id=user_id,
+                language=language,
+                sync_seq=next_value(session.connection(), sync_counter_name(user_id)),
+            )
+        )
+
+
+def changes_since(query, seq_column, entity, user_id, language, since, limit=SYNC_PAGE_SIZE):
+    """Return ``(rows, deleted_ids, cursor, has_more)`` for rows and tombstones
+    of ``entity`` with a sync_seq greater than ``since``."""
+    rows = query.filter(seq_column > since).order_by(seq_column).limit(limit + 1).all()
+    tombstones = (
+        SyncTombstone.query.filter(
+            SyncTombstone.user_id == user_id,
+            SyncTombstone.entity == entity,
+            SyncTombstone.sync_seq > since,
+            or_(SyncTombstone.language == language, SyncTombstone.language.is_(None)),
+        )
+        .order_by(SyncTombstone.sync_seq)
+        .limit(limit + 1)
+        .all()
+    )
+
+    def seq_of(item):
+        return item.sync_seq if isinstance(item, SyncTombstone) else getattr(item, seq_column.key)
+
+    merged = sorted(rows + tombstones, key=seq_of)
+    has_more = len(merged) > limit
+    merged = merged[:limit]
+    cursor = seq_of(merged[-1]) if merged else since
+    changed = [item for item in merged if not isinstance(item, SyncTombstone)]
+    deleted = [item.entity_id for item in merged if isinstance(item, SyncTombstone)]
+    return changed, deleted, cursor, has_more
+
+
+def vocab_changes(user_id, language, since, limit=SYNC_PAGE_SIZE):
+    query = VocabWord.query.filter(
+        VocabWord.user_id == user_id, VocabWord.language == language
+    )
+    return changes_since(query, VocabWord.sync_seq, "vocab", user_id, language, since, limit)
+
+
+def error_changes(user_id, language, since, limit=SYNC_PAGE_SIZE):
+    query = (
+        Error.query.join(Module, Error.module_id == Module.id)
+        .filter(Error.user_id == user_id, Module.language == language)
+    )
+    return changes_since(query, Error.sync_seq, "error", user_id, language, since, limit)
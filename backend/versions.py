@@ -0,0 +1,61 @@
+from functools import wraps
+
+from flask import make_response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, Chapter, Course, Instruction, Module, SyncCounter
+from sync import next_value, sync_counter_name
+
+
+# courses, chapters, modules and instructions share one scope: they are only
+# edited from the admin screens, and a course tree spans all four
+CATALOG_SCOPE = "version:catalog"
+CATALOG_MODELS = (Course, Chapter, Module, Instruction)
+
+
+def vocab_scope(user_id, **kwargs):
+    # the delta-sync counter already moves on every vocab change of the user
+    return sync_counter_name(user_id)
+
+
+def catalog_scope(**kwargs):
+    return CATALOG_SCOPE
+
+
+def current_version(scope):
+    value = db.session.scalar(
+        db.select(SyncCounter.value).where(SyncCounter.name == scope)
+    )
+    return value or 0
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_catalog_version(session, flush_context, instances):
+    changed = list(session.new) + list(session.dirty) + list(session.deleted)
+    if any(
+        isinstance(obj, CATALOG_MODELS)
+        and (obj not in session.dirty or session.is_modified(obj))
+        for obj in changed
+    ):
+        next_value(session.connection(), CATALOG_SCOPE)
+
+
+def conditional(scope_of):
+    """Answer GETs with an ETag built from the version counter of the scope
+    returned by ``scope_of(**view_args)`` and reply 304 when the client
+    already has it, without running the view."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            scope = scope_of(**kwargs)
+            etag = f"{scope}:{current_version(scope)}"
+            if etag in request.if_none_match:
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+        return wrapper
+    return decorator
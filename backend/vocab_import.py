@@ -0,0 +1,81 @@
+import csv
+import io
+from itertools import islice
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, VocabWord
+from sync import allocate_sync_seqs
+
+
+IMPORT_BATCH_SIZE = 1000
+
+
+def _insert_batch(user_id, language, words):
+    # Core inserts skip the ORM flush hook in sync.py, so stamp rows here
+    seqs = allocate_sync_seqs(db.session.connection(), user_id, len(words))
+    rows = [
+        {"user_id": user_id, "language": language, "word": w, "sync_seq": seq}
+        for w, seq in zip(words, seqs)
+    ]
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        table = VocabWord.__table__
+        stmt = (
+            dialect_insert(table)
+            .on_conflict_do_nothing(index_elements=["user_id", "language", "word"])
+            .returning(table.c.id)
+        )
+        # count RETURNING rows: rowcount is unreliable for executemany
+        return len(db.session.connection().execute(stmt, rows).all())
+
+    existing = set(
+        db.session.scalars(
+            select(VocabWord.word).where(
+                VocabWord.user_id == user_id,
+                VocabWord.language == language,
+                VocabWord.word.in_(words),
+            )
+        )
+    )
+    rows = [r for r in rows if r["word"] not in existing]
+    if rows:
+        db.session.connection().execute(insert(VocabWord.__table__), rows)
+    return len(rows)
+
+
+def ingest_words(user_id, language, words, batch_size=IMPORT_BATCH_SIZE):
+    """Insert ``words`` for a user, skipping blanks and ones already saved.
+
+    ``words`` may be any iterable, so uploads are consumed batch by batch
+    with one set-based statement per batch. Returns ``(inserted, skipped)``.
+    """
+    inserted = skipped = 0
+    words = iter(words)
+    while True:
+        chunk = list(islice(words, batch_size))
+        if not chunk:
+            break
+        cleaned = [w.strip() for w in chunk if w and w.strip()]
+        unique = list(dict.fromkeys(cleaned))
+        added = _insert_batch(user_id, language, unique) if unique else 0
+        inserted += added
+        skipped += len(chunk) - added
+    db.session.commit()
+    return inserted, skipped
+
+
+def iter_uploaded_words(stream, filename=""):
+    """Yield words from an uploaded CSV (first column) or plain-text file."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace")
+    if filename.lower().endswith(".csv"):
+        for i, row in enumerate(csv.reader(text)):
+            if not row:
+                continue
+            if i == 0 and row[0].strip().lower() == "word":
+                continue
+            yield row[0]
+    else:
+        for line in text:
+            yield line
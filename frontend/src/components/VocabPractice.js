@@ -18,6 +18,7 @@ function VocabPractice({ user, language, cefr, questionCount, onComplete, home }
   const [vocab, setVocab] = useState([]);
   const [prevLastCorrect, setPrevLastCorrect] = useState(null);
   const [prevCorrectCount, setPrevCorrectCount] = useState(0);
+  const [prevSchedule, setPrevSchedule] = useState(null);
   const [initialCorrect, setInitialCorrect] = useState(null);
 
   const toggleAssessment = () => {
@@ -30,6 +31,7 @@ function VocabPractice({ user, language, cefr, questionCount, onComplete, home }
         initial_correct: initialCorrect ? 1 : 0,
         prev_last_correct: prevLastCorrect,
         prev_correct_count: prevCorrectCount,
+        prev_schedule: prevSchedule,
       })
       .then(() => {
         if (correct) {
@@ -70,6 +72,7 @@ function VocabPractice({ user, language, cefr, questionCount, onComplete, home }
       setChecked((res.data.errors || []).map(() => true));
       setPrevLastCorrect(res.data.prev_last_correct);
       setPrevCorrectCount(res.data.prev_correct_count);
+      setPrevSchedule(res.data.prev_schedule);
       setInitialCorrect(res.data.correct === 1);
       if (res.data.correct === 1) {
         setCorrectCount(c => c + 1);